@@ -0,0 +1,62 @@
+"""
+Benchmarks batch analysis throughput with a stubbed Gemini model and a stubbed
+eBay search, comparing sequential processing to the bounded-concurrency fan-out
+used by /analyze-image/batch.
+
+Usage: python bench/bench_batch.py [num_images] [model_latency_s] [ebay_latency_s]
+"""
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("COMPARABLES_TTL", "0")
+os.environ.setdefault("COMPARABLES_STALE_TTL", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lib.ebay
+from lib import analysis
+from lib.governor import model_governor, MODEL_CONCURRENCY
+from lib.model_backends import ImagePart, StubBackend
+
+
+def stub_search(latency: float):
+    async def search_items(query, limit=10):
+        await asyncio.sleep(latency)
+        return {"itemSummaries": [{"title": query, "price": {"value": "15.00", "currency": "USD"}}]}
+    return search_items
+
+
+async def run(num_images: int, model_latency: float, ebay_latency: float):
+    model = StubBackend(latency=model_latency, latency_dist="fixed")
+    lib.ebay.search_items = stub_search(ebay_latency)
+
+    start = time.perf_counter()
+    for i in range(num_images):
+        await analysis.run_analysis(model, ImagePart(b"%d" % i, "image/jpeg"), "two_pass")
+    sequential = time.perf_counter() - start
+
+    # Same fan-out as /analyze-image/batch
+    batch_slots = asyncio.Semaphore(MODEL_CONCURRENCY)
+
+    async def analyze_one(i):
+        async with batch_slots:
+            return await analysis.run_analysis(model, ImagePart(b"%d" % i, "image/jpeg"), "two_pass")
+
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(analyze_one(num_images + i)) for i in range(num_images)]
+    for next_result in asyncio.as_completed(tasks):
+        await next_result
+    batched = time.perf_counter() - start
+
+    print(f"images={num_images} model_latency={model_latency}s ebay_latency={ebay_latency}s "
+          f"MODEL_CONCURRENCY={model_governor.max_concurrency} EBAY_CONCURRENCY={lib.ebay.EBAY_CONCURRENCY}")
+    print(f"sequential: {sequential:.2f}s ({num_images / sequential:.1f} images/s)")
+    print(f"batched:    {batched:.2f}s ({num_images / batched:.1f} images/s)")
+
+
+if __name__ == "__main__":
+    num_images = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    model_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    ebay_latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    asyncio.run(run(num_images, model_latency, ebay_latency))
@@ -0,0 +1,108 @@
+"""
+Benchmarks publishing many listings against the local mock Trading API
+(bench/mock_ebay.py): one UploadSiteHostedPictures + AddItem per listing in
+sequence (what N calls to /post/ do) versus the bulk publisher (concurrent
+uploads, AddItems batches of 5), then re-posting the same pictures, which the
+picture cache serves without uploading.
+
+Usage: python bench/bench_bulk_publish.py [num_listings] [latency_s] [fail_rate]
+"""
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+PORT = _free_port()
+os.environ["EBAY_TRADING_ENDPOINT"] = f"http://127.0.0.1:{PORT}/ws/api.dll"
+os.environ["PICTURE_CACHE_DB"] = os.path.join(tempfile.mkdtemp(), "picture_cache.db")
+
+import uvicorn
+
+import mock_ebay
+from lib.ebay_logic import create_ebay_listing_async, create_ebay_listings_bulk
+from lib.http_client import start_http_client, close_http_client
+from lib.picture_cache import picture_cache
+
+
+def start_mock_server():
+    server = uvicorn.Server(uvicorn.Config(mock_ebay.app, host="127.0.0.1", port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def make_listings(count: int):
+    return [{
+        "title": f"Test listing {i}", "description": "Benchmark listing.",
+        "price": 9.99 + i, "condition": "Used", "image_data": os.urandom(64 * 1024),
+    } for i in range(count)]
+
+
+async def sequential(listings):
+    results = []
+    for listing in listings:
+        try:
+            results.append(await create_ebay_listing_async(**listing))
+        except Exception as e:
+            results.append(e)
+    return sum(1 for r in results if not isinstance(r, Exception))
+
+
+async def bulk(listings):
+    results = await create_ebay_listings_bulk(listings)
+    return sum(1 for r in results if "itemId" in r)
+
+
+def snapshot_calls():
+    return dict(mock_ebay.stats["calls"])
+
+
+async def run(name, coro_fn, listings):
+    before = snapshot_calls()
+    start = time.perf_counter()
+    published = await coro_fn(listings)
+    elapsed = time.perf_counter() - start
+    calls = {k: v - before.get(k, 0) for k, v in snapshot_calls().items() if v - before.get(k, 0)}
+    print(f"{name:>10}: {published}/{len(listings)} published in {elapsed:6.2f}s "
+          f"({len(listings) / elapsed:5.1f} listings/s), calls {calls}")
+
+
+async def main():
+    num_listings = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    fail_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    mock_ebay.configure(latency, fail_rate)
+
+    print(f"{num_listings} listings, {latency * 1000:.0f} ms per Trading call, {fail_rate:.0%} item failures")
+    await start_http_client()
+    try:
+        await run("sequential", sequential, make_listings(num_listings))
+        listings = make_listings(num_listings)
+        await run("bulk", bulk, listings)
+        await run("re-post", bulk, listings)
+        print(f"picture cache: {picture_cache.stats()}")
+    finally:
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    server = start_mock_server()
+    try:
+        asyncio.run(main())
+    finally:
+        server.should_exit = True
@@ -0,0 +1,87 @@
+"""
+Compares the size of the comparables section of the price prompt: the full
+Browse payload as indented JSON (the old format) versus the compact table.
+
+Usage: python bench/bench_comparables_prompt.py [payload.json] [--live]
+
+Without a payload file a synthetic 10-listing Browse response is used. Token
+counts are estimated at ~4 characters per token unless --live is given, in
+which case Gemini's count_tokens is used and both prompts are timed against
+the model (requires PROJECT_ID and Vertex AI credentials).
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.comparables import iter_comparables, format_comparables_table
+
+
+def synthetic_payload(count: int = 10):
+    summaries = []
+    for i in range(count):
+        item_id = f"v1|1100{i:08d}|0"
+        summaries.append({
+            "itemId": item_id,
+            "title": f"Sony WH-1000XM4 Wireless Noise Cancelling Headphones Black #{i}",
+            "leafCategoryIds": ["112529"],
+            "categories": [
+                {"categoryId": "112529", "categoryName": "Headphones"},
+                {"categoryId": "293", "categoryName": "Consumer Electronics"},
+            ],
+            "image": {"imageUrl": f"https://i.ebayimg.sandbox.ebay.com/images/g/abc{i}/s-l225.jpg"},
+            "price": {"value": f"{150 + i * 7}.00", "currency": "USD"},
+            "itemHref": f"https://api.sandbox.ebay.com/buy/browse/v1/item/{item_id}",
+            "seller": {"username": f"seller_{i}", "feedbackPercentage": "99.2", "feedbackScore": 1200 + i},
+            "condition": "Used" if i % 3 else "New",
+            "conditionId": "3000" if i % 3 else "1000",
+            "thumbnailImages": [{"imageUrl": f"https://i.ebayimg.sandbox.ebay.com/images/g/abc{i}/s-l1600.jpg"}],
+            "shippingOptions": [{"shippingCostType": "FIXED", "shippingCost": {"value": "5.99", "currency": "USD"}}],
+            "buyingOptions": ["FIXED_PRICE", "BEST_OFFER"] if i % 2 else ["AUCTION"],
+            "itemWebUrl": f"https://www.sandbox.ebay.com/itm/1100{i:08d}",
+            "itemLocation": {"postalCode": "951**", "country": "US"},
+            "additionalImages": [{"imageUrl": f"https://i.ebayimg.sandbox.ebay.com/images/g/def{i}/s-l225.jpg"}],
+            "adultOnly": False,
+            "legacyItemId": f"1100{i:08d}",
+            "availableCoupons": False,
+            "itemCreationDate": "2025-10-01T12:00:00.000Z",
+            "topRatedBuyingExperience": False,
+            "priorityListing": False,
+            "listingMarketplaceId": "EBAY_US",
+        })
+    return {"href": "https://api.sandbox.ebay.com/buy/browse/v1/item_summary/search?q=sony",
+            "total": count, "limit": count, "offset": 0, "itemSummaries": summaries}
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    live = "--live" in sys.argv
+    if args:
+        with open(args[0], "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    else:
+        payload = synthetic_payload()
+
+    before = json.dumps(payload, indent=2)
+    after = format_comparables_table(iter_comparables(payload))
+
+    if live:
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
+        vertexai.init(project=os.environ["PROJECT_ID"])
+        model = GenerativeModel("gemini-2.5-flash")
+        for name, text in (("before", before), ("after", after)):
+            tokens = model.count_tokens(text).total_tokens
+            start = time.perf_counter()
+            model.generate_content(f"Suggest a price in USD for the item in these listings:\n{text}")
+            print(f"{name:>6}: {len(text)} chars, {tokens} tokens, {time.perf_counter() - start:.2f}s model latency")
+    else:
+        for name, text in (("before", before), ("after", after)):
+            print(f"{name:>6}: {len(text)} chars, ~{len(text) // 4} tokens")
+    print(f"reduction: {100 * (1 - len(after) / len(before)):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
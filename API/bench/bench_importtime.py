@@ -0,0 +1,70 @@
+"""
+Measures how long `import main` takes with `python -X importtime`, which is
+what every worker pays before it can serve `/`. Prints the median over a few
+fresh interpreters and the slowest top-level imports, and exits non-zero if
+the median is over budget or if a module that must not load at import time
+(Vertex AI, ebaysdk) was imported, so it can run as a regression check.
+
+Usage: python bench/bench_importtime.py [runs] [budget_ms]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Vertex AI is loaded on first use by VertexBackend (lib/model_backends.py,
+# through the lib/providers.py provider). The app no longer uses ebaysdk at
+# all; it is listed so it can't creep back into the import path.
+LAZY_MODULES = ("vertexai", "google.cloud.aiplatform", "ebaysdk")
+
+
+def import_profile() -> dict:
+    """
+    Imports main in a fresh interpreter and returns {module: (self_us, cumulative_us, depth)}.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=API_DIR, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    profiles = [import_profile() for _ in range(runs)]
+    totals = [profile["main"][1] / 1000 for profile in profiles]
+    median = statistics.median(totals)
+    last = profiles[-1]
+
+    print(f"import main: median {median:.0f} ms over {runs} runs (min {min(totals):.0f}, max {max(totals):.0f})")
+    print("slowest imports under main (cumulative ms):")
+    top_level = sorted(
+        ((cumulative, name) for name, (_, cumulative, depth) in last.items() if depth == 1),
+        reverse=True)
+    for cumulative, name in top_level[:10]:
+        print(f"  {cumulative / 1000:7.1f}  {name}")
+
+    failed = False
+    eager = sorted(name for name in last
+                   if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES))
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager[:5])}{' ...' if len(eager) > 5 else ''}")
+        failed = True
+    if median > budget_ms:
+        print(f"FAIL: median import time {median:.0f} ms is over the {budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
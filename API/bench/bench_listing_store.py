@@ -0,0 +1,70 @@
+"""
+Benchmarks the SQLite listing store against the old active_listings.csv ledger
+(append on add, full rewrite on remove, linear scan on lookup).
+
+Usage: python bench/bench_listing_store.py [num_listings] [num_removals]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.listing_store import ListingStore
+
+
+def csv_add(path, item_id, title):
+    exists = os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if not exists:
+            writer.writerow(["item_id", "title", "created_at"])
+        writer.writerow([item_id, title, time.strftime("%Y-%m-%d %H:%M:%S")])
+
+
+def csv_remove(path, item_id):
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        rows = [row for row in csv.reader(file) if row and row[0] != item_id]
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows(rows)
+
+
+def csv_get(path, item_id):
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        return next((row for row in csv.DictReader(file) if row["item_id"] == item_id), None)
+
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<8} {elapsed * 1000 / count:8.3f} ms/op")
+
+
+def main():
+    num_listings = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    num_removals = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    item_ids = [str(110000000000 + i) for i in range(num_listings)]
+    victims = random.sample(item_ids, num_removals)
+    workdir = tempfile.mkdtemp()
+
+    print(f"{num_listings} listings, {num_removals} removals and lookups")
+    csv_path = os.path.join(workdir, "active_listings.csv")
+    print("csv")
+    timed("add", lambda: [csv_add(csv_path, i, f"Listing {i}") for i in item_ids], num_listings)
+    timed("lookup", lambda: [csv_get(csv_path, i) for i in victims], num_removals)
+    timed("remove", lambda: [csv_remove(csv_path, i) for i in victims], num_removals)
+
+    store = ListingStore(os.path.join(workdir, "listings.db"), csv_path=None)
+    print("sqlite")
+    timed("add", lambda: [store.add(i, f"Listing {i}") for i in item_ids], num_listings)
+    timed("lookup", lambda: [store.get(i) for i in victims], num_removals)
+    timed("remove", lambda: [store.end(i) for i in victims], num_removals)
+    timed("page", lambda: store.page(limit=100, cursor=num_listings // 2), 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmarks near-duplicate lookup in the perceptual-hash index.
+
+Usage: python bench/bench_phash.py [num_hashes] [num_queries]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.phash import MultiIndexHash, hamming, PHASH_MAX_DISTANCE
+
+
+def flip_bits(value: int, count: int) -> int:
+    for bit in random.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def main():
+    num_hashes = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    random.seed(0)
+
+    hashes = [random.getrandbits(64) for _ in range(num_hashes)]
+    # Half of the queries are re-shots of stored items, half are unseen items
+    queries = [
+        flip_bits(random.choice(hashes), random.randint(0, PHASH_MAX_DISTANCE))
+        if i % 2 == 0 else random.getrandbits(64)
+        for i in range(num_queries)
+    ]
+
+    start = time.perf_counter()
+    index = MultiIndexHash(PHASH_MAX_DISTANCE)
+    for i, h in enumerate(hashes):
+        index.add(h, i)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index_found = sum(1 for q in queries if index.search(q))
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scan_found = sum(
+        1 for q in queries if any(hamming(q, h) <= PHASH_MAX_DISTANCE for h in hashes))
+    scan_time = time.perf_counter() - start
+
+    print(f"hashes={num_hashes} queries={num_queries} max_distance={PHASH_MAX_DISTANCE}")
+    print(f"index build:  {build_time:.2f}s")
+    print(f"index lookup: {index_time / num_queries * 1000:.3f} ms/query ({index_found} matched)")
+    print(f"linear scan:  {scan_time / num_queries * 1000:.3f} ms/query ({scan_found} matched)")
+
+
+if __name__ == "__main__":
+    main()
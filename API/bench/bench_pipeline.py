@@ -0,0 +1,160 @@
+"""
+End-to-end load test of /analyze-image/ without Vertex AI or eBay: runs the
+real app with MODEL_BACKEND=stub and its eBay calls pointed at
+bench/mock_ebay.py, both as local servers, and drives it with distinct photos
+at a fixed concurrency. Everything in between (upload handling, image
+preprocessing, caches, the model governor, token refresh, Browse search and
+its breaker) is the production code. Model and eBay latency and failure rates
+are set from the command line, and runs with the same seed make the same
+model decisions, so configurations can be compared run to run.
+
+Usage: python bench/bench_pipeline.py [--requests 200] [--concurrency 16] [--mode two_pass]
+                                      [--model-latency 1.0] [--model-error-rate 0.0] ...
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(API_DIR, "bench")
+sys.path.insert(0, API_DIR)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _make_images(count: int, seed: int) -> list:
+    from PIL import Image
+
+    images = []
+    for i in range(count):
+        rng = random.Random(f"{seed}:{i}")
+        img = Image.frombytes("RGB", (320, 240), rng.randbytes(320 * 240 * 3))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=80)
+        images.append(buffer.getvalue())
+    return images
+
+
+def _wait_ready(url: str, server: subprocess.Popen):
+    import httpx
+
+    for _ in range(600):
+        if server.poll() is not None:
+            raise RuntimeError(f"{url} exited during startup")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+async def _drive(port: int, images: list, concurrency: int, mode: str):
+    import httpx
+
+    latencies = []
+    statuses = {}
+    queue = list(enumerate(images))
+    url = f"http://127.0.0.1:{port}/analyze-image/"
+
+    async def worker(client):
+        while queue:
+            i, image = queue.pop()
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    url, params={"mode": mode}, files={"image": (f"photo{i}.jpg", image, "image/jpeg")})
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async with httpx.AsyncClient(timeout=300, limits=httpx.Limits(max_connections=concurrency)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        metrics = (await client.get(f"http://127.0.0.1:{port}/metrics")).json()
+    return latencies, statuses, elapsed, metrics
+
+
+def _percentile(values: list, pct: float) -> float:
+    return values[min(int(len(values) * pct / 100), len(values) - 1)] if values else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of /analyze-image/ against local stubs.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", default="two_pass", choices=("two_pass", "fused"))
+    parser.add_argument("--model-latency", type=float, default=1.0)
+    parser.add_argument("--model-latency-dist", default="lognormal", choices=("fixed", "uniform", "lognormal"))
+    parser.add_argument("--model-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--model-error-rate", type=float, default=0.0)
+    parser.add_argument("--ebay-latency", type=float, default=0.15)
+    parser.add_argument("--ebay-fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    import httpx
+
+    images = _make_images(args.requests, args.seed)
+    ebay_port, api_port = _free_port(), _free_port()
+    servers = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ, CLIENT_ID="bench", CLIENT_SECRET="bench",
+            MODEL_BACKEND="stub", STUB_MODEL_SEED=str(args.seed), STUB_MODEL_LATENCY=str(args.model_latency),
+            STUB_MODEL_LATENCY_DIST=args.model_latency_dist,
+            STUB_MODEL_THROTTLE_RATE=str(args.model_throttle_rate),
+            STUB_MODEL_ERROR_RATE=str(args.model_error_rate),
+            EBAY_API_URL=f"http://127.0.0.1:{ebay_port}",
+            EBAY_TRADING_ENDPOINT=f"http://127.0.0.1:{ebay_port}/ws/api.dll",
+            STATE_BACKEND="memory", JOBS_DB=os.path.join(tmp, "jobs.db"), DRAFTS_DB=os.path.join(tmp, "drafts.db"),
+            PICTURE_CACHE_DB=os.path.join(tmp, "picture_cache.db"))
+        try:
+            servers.append(subprocess.Popen(
+                [sys.executable, os.path.join(BENCH_DIR, "mock_ebay.py"), "--port", str(ebay_port),
+                 "--latency", str(args.ebay_latency), "--fail-rate", str(args.ebay_fail_rate)],
+                env=env, stdout=subprocess.DEVNULL))
+            servers.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port),
+                 "--log-level", "warning", "--no-access-log"],
+                cwd=API_DIR, env=env, stdout=subprocess.DEVNULL))
+            _wait_ready(f"http://127.0.0.1:{ebay_port}/stats", servers[0])
+            _wait_ready(f"http://127.0.0.1:{api_port}/ready", servers[1])
+            latencies, statuses, elapsed, metrics = asyncio.run(
+                _drive(api_port, images, args.concurrency, args.mode))
+            ebay_calls = httpx.get(f"http://127.0.0.1:{ebay_port}/stats").json()["calls"]
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
+
+    latencies.sort()
+    ok = statuses.get(200, 0)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, mode {args.mode}, seed {args.seed}; "
+          f"model {args.model_latency:g}s {args.model_latency_dist}, throttle {args.model_throttle_rate:g}, "
+          f"error {args.model_error_rate:g}; eBay {args.ebay_latency:g}s, fail {args.ebay_fail_rate:g}")
+    print(f"throughput {ok / elapsed:.2f} req/s over {elapsed:.1f}s, {ok} ok, "
+          f"{args.requests - ok} failed {dict(sorted((str(k), v) for k, v in statuses.items() if k != 200))}")
+    print(f"latency ms: p50 {_percentile(latencies, 50) * 1000:.0f}, p95 {_percentile(latencies, 95) * 1000:.0f}, "
+          f"p99 {_percentile(latencies, 99) * 1000:.0f}, max {(latencies[-1] if latencies else 0) * 1000:.0f}")
+    print(f"model governor: {metrics.get('modelGovernor')}")
+    print(f"eBay calls: {ebay_calls}; search: {metrics.get('ebaySearch')}; degraded: {metrics.get('degraded')}")
+
+
+if __name__ == "__main__":
+    main()
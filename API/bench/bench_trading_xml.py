@@ -0,0 +1,135 @@
+"""
+Micro-benchmarks Trading API request building and response parsing:
+f-string XML + ET.fromstring/find (the previous code) versus the precompiled
+templates and pull parser in lib/trading_xml.py.
+
+Usage: python bench/bench_trading_xml.py [iterations]
+"""
+import os
+import sys
+import timeit
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.trading_xml import build_request, parse_response, render_item
+
+NS = {"eb": "urn:ebay:apis:eBLBaseComponents"}
+FIELDS = {
+    "title": "Sony WH-1000XM4 Wireless Noise-Cancelling Over-the-Ear Headphones, Black",
+    "description": "Experience the ultimate in sound quality and comfort with the Sony WH-1000XM4 headphones.",
+    "picture_url": "https://m.media-amazon.com/images/I/61UgZSYRllL._UF894,1000_QL80_.jpg",
+    "start_price": "299.99",
+}
+
+
+def fstring_request(token, title, description, picture_url, start_price):
+    item_xml = f"""<Item>
+  <Title>{title}</Title>
+  <Description>{description}</Description>
+  <PrimaryCategory><CategoryID>9355</CategoryID></PrimaryCategory>
+  <ConditionID>1000</ConditionID>
+  <ListingType>FixedPriceItem</ListingType>
+  <ListingDuration>GTC</ListingDuration>
+  <StartPrice currencyID="USD">{start_price}</StartPrice>
+  <Quantity>1</Quantity>
+  <Country>US</Country>
+  <Currency>USD</Currency>
+  <PostalCode>94105</PostalCode>
+  <DispatchTimeMax>2</DispatchTimeMax>
+  <ItemSpecifics>
+    <NameValueList><Name>Brand</Name><Value>Apple</Value></NameValueList>
+    <NameValueList><Name>Model</Name><Value>iPhone 12</Value></NameValueList>
+    <NameValueList><Name>Storage Capacity</Name><Value>128 GB</Value></NameValueList>
+    <NameValueList><Name>Color</Name><Value>Black</Value></NameValueList>
+  </ItemSpecifics>
+  <ReturnPolicy>
+    <ReturnsAcceptedOption>ReturnsAccepted</ReturnsAcceptedOption>
+    <ReturnsWithinOption>Days_30</ReturnsWithinOption>
+    <RefundOption>MoneyBack</RefundOption>
+    <ShippingCostPaidByOption>Buyer</ShippingCostPaidByOption>
+  </ReturnPolicy>
+  <ShippingDetails>
+    <ShippingServiceOptions>
+      <ShippingServicePriority>1</ShippingServicePriority>
+      <ShippingService>USPSPriority</ShippingService>
+      <ShippingServiceCost currencyID="USD">5.00</ShippingServiceCost>
+    </ShippingServiceOptions>
+  </ShippingDetails>
+  <PictureDetails>
+    <PictureURL>{picture_url}</PictureURL>
+  </PictureDetails>
+  <CategoryMappingAllowed>true</CategoryMappingAllowed>
+</Item>"""
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<AddItemRequest xmlns="urn:ebay:apis:eBLBaseComponents">
+  <RequesterCredentials><eBayAuthToken>{token}</eBayAuthToken></RequesterCredentials>
+  {item_xml}
+</AddItemRequest>"""
+
+
+def template_request(token, **fields):
+    return build_request("AddItem", render_item(**fields), token)
+
+
+ADD_ITEM_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?><AddItemResponse xmlns="urn:ebay:apis:eBLBaseComponents">'
+    "<Timestamp>2025-10-01T12:00:00.000Z</Timestamp><Ack>Success</Ack><Version>1193</Version>"
+    "<Build>E1193_CORE_API_1</Build><ItemID>110588449674</ItemID>"
+    "<StartTime>2025-10-01T12:00:00.000Z</StartTime><EndTime>2025-10-31T12:00:00.000Z</EndTime>"
+    "<Fees>" + "".join(
+        f"<Fee><Name>Fee{i}</Name><Fee currencyID=\"USD\">0.0</Fee></Fee>" for i in range(20)) +
+    "</Fees></AddItemResponse>"
+).encode()
+
+GET_ITEM_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?><GetItemResponse xmlns="urn:ebay:apis:eBLBaseComponents">'
+    "<Timestamp>2025-10-01T12:00:00.000Z</Timestamp><Ack>Success</Ack><Version>1193</Version>"
+    "<Item><AutoPay>false</AutoPay><Country>US</Country><Currency>USD</Currency>"
+    "<ItemID>110588449674</ItemID><ListingDetails><StartTime>2025-10-01T12:00:00.000Z</StartTime>"
+    "<ViewItemURL>https://sandbox.ebay.com/itm/110588449674</ViewItemURL></ListingDetails>"
+    "<Description>" + "Great condition, barely used. " * 1000 + "</Description>"
+    + "".join(f"<NameValueList><Name>Spec{i}</Name><Value>Value{i}</Value></NameValueList>" for i in range(200))
+    + "<SellingStatus><ListingStatus>Active</ListingStatus></SellingStatus></Item></GetItemResponse>"
+).encode()
+
+
+def etree_item_id(content):
+    root = ET.fromstring(content)
+    item_id_el = root.find("eb:ItemID", NS)
+    ack_el = root.find("eb:Ack", NS)
+    return item_id_el.text, ack_el.text
+
+
+def etree_view_url(content):
+    root = ET.fromstring(content)
+    return root.find(".//eb:ViewItemURL", NS).text
+
+
+def bench(label, fn, iterations):
+    seconds = min(timeit.repeat(fn, number=iterations, repeat=5)) / iterations
+    print(f"  {label:<34} {seconds * 1e6:9.1f} us")
+    return seconds
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("AddItem request body")
+    old = bench("f-string (unescaped)", lambda: fstring_request("token", **FIELDS), iterations)
+    new = bench("precompiled template (escaped)", lambda: template_request("token", **FIELDS), iterations)
+    print(f"  speedup {old / new:.2f}x")
+
+    print(f"AddItem response ({len(ADD_ITEM_RESPONSE)} bytes): Ack + ItemID")
+    old = bench("ET.fromstring + find", lambda: etree_item_id(ADD_ITEM_RESPONSE), iterations)
+    new = bench("pull parser", lambda: parse_response(ADD_ITEM_RESPONSE, ("ItemID",)), iterations)
+    print(f"  speedup {old / new:.2f}x")
+
+    print(f"GetItem response ({len(GET_ITEM_RESPONSE)} bytes): ViewItemURL")
+    old = bench("ET.fromstring + find(.//)", lambda: etree_view_url(GET_ITEM_RESPONSE), iterations // 10)
+    new = bench("pull parser", lambda: parse_response(GET_ITEM_RESPONSE, ("ViewItemURL",)), iterations // 10)
+    print(f"  speedup {old / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
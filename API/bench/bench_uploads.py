@@ -0,0 +1,104 @@
+"""
+Measures server memory with many concurrent large uploads: reading each
+UploadFile into bytes (the previous handlers) versus streaming it through
+lib/uploads.py (chunked hashing, spooled to disk, path handed downstream).
+Each mode runs in its own uvicorn process and its peak RSS (VmHWM) is read
+from /proc, so this only runs on Linux.
+
+Usage: python bench/bench_uploads.py [concurrency] [upload_mb] [hold_s]
+"""
+import asyncio
+import hashlib
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from fastapi import FastAPI, File, UploadFile
+
+from lib.uploads import ingest_upload
+
+HOLD_SECONDS = float(os.environ.get("BENCH_HOLD_SECONDS", 2.0))
+
+app = FastAPI()
+
+
+@app.post("/buffered")
+async def buffered(image: UploadFile = File(...)):
+    image_data = await image.read()
+    digest = hashlib.sha256(image_data).hexdigest()
+    wrapped = io.BytesIO(image_data)  # what the ebaysdk upload path did
+    await asyncio.sleep(HOLD_SECONDS)  # downstream model / eBay work
+    return {"digest": digest, "size": len(wrapped.getbuffer())}
+
+
+@app.post("/streaming")
+async def streaming(image: UploadFile = File(...)):
+    with await ingest_upload(image) as upload:
+        await asyncio.sleep(HOLD_SECONDS)
+        return {"digest": upload.digest, "size": upload.size}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_status(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) // 1024
+    return 0
+
+
+async def run_mode(mode: str, concurrency: int, payload: bytes, hold: float):
+    import httpx
+
+    port = _free_port()
+    env = dict(os.environ, BENCH_HOLD_SECONDS=str(hold), PYTHONPATH=API_DIR)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench_uploads:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    try:
+        async with httpx.AsyncClient(timeout=300) as client:
+            for _ in range(100):
+                try:
+                    await client.post(f"http://127.0.0.1:{port}/{mode}", files={"image": ("w.jpg", b"x", "image/jpeg")})
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            baseline = _proc_status(server.pid, "VmRSS")
+
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post(f"http://127.0.0.1:{port}/{mode}", files={"image": ("photo.jpg", payload, "image/jpeg")})
+                for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            peak = _proc_status(server.pid, "VmHWM")
+        ok = sum(1 for r in responses if r.status_code == 200)
+        print(f"{mode:>10}: {ok}/{concurrency} ok in {elapsed:5.1f}s, "
+              f"RSS baseline {baseline} MB, peak {peak} MB (+{peak - baseline} MB)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    upload_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    hold = float(sys.argv[3]) if len(sys.argv) > 3 else HOLD_SECONDS
+    payload = os.urandom(int(upload_mb * 1024 * 1024))
+    print(f"{concurrency} concurrent uploads of {upload_mb:g} MB, each held {hold:g}s downstream")
+    for mode in ("buffered", "streaming"):
+        await run_mode(mode, concurrency, payload, hold)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,220 @@
+"""
+Load test for the multi-worker deployment: runs the real app under
+`uvicorn --workers N` with a fake Gemini model and eBay search, drives
+/analyze-image/ from several client processes and reports throughput and
+latency per worker count. Every photo is analyzed once before the timed run;
+the model calls column counts the ones made during it. With a shared
+STATE_BACKEND that is zero, with "memory" each worker analyzes every photo
+again.
+
+The client processes run on the same machine, so leave some cores free for
+them; on a single-core machine no scaling is possible.
+
+Usage: python bench/bench_workers.py [max_workers] [duration_s] [concurrency] [state_backend]
+"""
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+MODEL_LATENCY = float(os.environ.get("BENCH_MODEL_LATENCY", 0.3))
+MODEL_CALLS_LOG = os.environ.get("BENCH_MODEL_CALLS_LOG")
+NUM_IMAGES = 64
+
+
+class FakeModel:
+    """
+    Answers the two-pass prompts after MODEL_LATENCY seconds, without using CPU.
+    """
+
+    async def generate_json(self, contents):
+        await asyncio.sleep(MODEL_LATENCY)
+        if MODEL_CALLS_LOG:
+            with open(MODEL_CALLS_LOG, "a") as log:
+                log.write(f"{os.getpid()}\n")
+        if "estimatedPrice" in contents[-1]:
+            return json.dumps({"estimatedPrice": {"min": 80, "max": 120, "suggested": 100}})
+        return json.dumps({
+            "item": "Sony WH-1000XM4", "brand": "Sony", "description": "Wireless headphones",
+            "searchKeywords": ["sony", "wh-1000xm4"], "condition": "Used - Good", "imageQuality": "Good"})
+
+
+async def _fake_search(query, limit=10, **kwargs):
+    await asyncio.sleep(MODEL_LATENCY / 3)
+    return {"itemSummaries": [{"title": "Sony WH-1000XM4", "price": {"value": "95.00", "currency": "USD"},
+                               "condition": "Used", "buyingOptions": ["FIXED_PRICE"]}]}
+
+
+def _server_app():
+    import main
+    import lib.ebay
+    from lib.providers import model_backend
+
+    model_backend.override(FakeModel())
+    lib.ebay.search_items = _fake_search
+    # A token that will not need refreshing during the run
+    lib.ebay._token_cache.update(token="bench", expires_at=time.time() + 7200)
+    return main.app
+
+
+if os.environ.get("BENCH_WORKERS_SERVER"):
+    app = _server_app()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _make_images(count: int) -> list:
+    from PIL import Image
+
+    images = []
+    for seed in range(count):
+        rng = random.Random(seed)
+        img = Image.frombytes("RGB", (320, 240), rng.randbytes(320 * 240 * 3))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=80)
+        images.append(buffer.getvalue())
+    return images
+
+
+async def _client_loop(port: int, images: list, concurrency: int, duration: float, first: int):
+    import httpx
+
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset):
+        nonlocal errors
+        i = offset
+        async with httpx.AsyncClient(timeout=60) as client:
+            while time.perf_counter() < deadline:
+                image = images[i % len(images)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.post(
+                        f"http://127.0.0.1:{port}/analyze-image/",
+                        files={"image": ("photo.jpg", image, "image/jpeg")})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+    # Staggered so concurrent requests are for different photos
+    await asyncio.gather(*(worker(first + offset) for offset in range(concurrency)))
+    return latencies, errors
+
+
+def _client_process(args):
+    return asyncio.run(_client_loop(*args))
+
+
+def _count_lines(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path) as file:
+        return sum(1 for _ in file)
+
+
+async def _warm_up(port: int, images: list):
+    import httpx
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        responses = await asyncio.gather(*(
+            client.post(f"http://127.0.0.1:{port}/analyze-image/", files={"image": ("photo.jpg", image, "image/jpeg")})
+            for image in images))
+    for response in responses:
+        response.raise_for_status()
+
+
+def _wait_ready(port: int, server: subprocess.Popen):
+    import httpx
+
+    for _ in range(600):
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def run(workers: int, backend: str, duration: float, concurrency: int, images: list, clients: int):
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        calls_log = os.path.join(tmp, "model_calls.log")
+        env = dict(
+            os.environ, PYTHONPATH=API_DIR, BENCH_WORKERS_SERVER="1", BENCH_MODEL_CALLS_LOG=calls_log,
+            STATE_BACKEND=backend, STATE_DB=os.path.join(tmp, "state.db"), JOBS_DB=os.path.join(tmp, "jobs.db"),
+            DRAFTS_DB=os.path.join(tmp, "drafts.db"), PICTURE_CACHE_DB=os.path.join(tmp, "picture_cache.db"),
+            IMAGE_PREP_WORKERS="1", CLIENT_ID="bench", CLIENT_SECRET="bench")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "bench_workers:app", "--port", str(port), "--workers", str(workers),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.DEVNULL)
+        try:
+            _wait_ready(port, server)
+            # Every photo is analyzed once up front, by whichever worker gets it
+            asyncio.run(_warm_up(port, images))
+            warm_calls = _count_lines(calls_log)
+            per_client = max(concurrency // clients, 1)
+            with multiprocessing.Pool(clients) as pool:
+                results = pool.map(_client_process, [
+                    (port, images, per_client, duration, client * per_client) for client in range(clients)])
+        finally:
+            server.terminate()
+            server.wait()
+        model_calls = _count_lines(calls_log) - warm_calls
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    errors = sum(client_errors for _, client_errors in results)
+    p50 = latencies[len(latencies) // 2] if latencies else 0
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    return len(latencies) / duration, p50, p95, errors, model_calls
+
+
+def main():
+    cores = os.cpu_count() or 1
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else max(cores // 2, 1)
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    backend = sys.argv[4] if len(sys.argv) > 4 else "sqlite"
+    clients = max(min(cores - max_workers, 8), 1)
+    images = _make_images(NUM_IMAGES)
+
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+
+    print(f"{cores} cores, {clients} client processes, {concurrency} concurrent requests, "
+          f"{NUM_IMAGES} distinct photos, {duration:g}s per run, STATE_BACKEND={backend}")
+    print(f"{'workers':>7} {'req/s':>8} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'model calls':>12}")
+    baseline = None
+    for workers in counts:
+        rate, p50, p95, errors, model_calls = run(workers, backend, duration, concurrency, images, clients)
+        baseline = baseline or rate
+        print(f"{workers:>7} {rate:>8.1f} {rate / baseline:>7.2f}x {p50 * 1000:>8.0f} {p95 * 1000:>8.0f} "
+              f"{errors:>7} {model_calls:>12}")
+
+
+if __name__ == "__main__":
+    main()
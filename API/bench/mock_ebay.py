@@ -0,0 +1,130 @@
+"""
+Local mock of the eBay APIs for benchmarks and offline testing. Answers the
+Trading calls UploadSiteHostedPictures, AddItem, AddItems, VerifyAddItem,
+EndItem and GetItem with canned XML, the OAuth client-credentials token
+request, and Browse item_summary/search with comparables derived from a hash
+of the query, so the same search always returns the same listings. Every call
+waits a configurable delay; listings and searches fail at the fail rate.
+
+Usage: python bench/mock_ebay.py [--port 8900] [--latency 0.2] [--fail-rate 0.0]
+Then point the API at it with EBAY_TRADING_ENDPOINT=http://127.0.0.1:8900/ws/api.dll
+and EBAY_API_URL=http://127.0.0.1:8900
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import random
+import re
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+NS = "urn:ebay:apis:eBLBaseComponents"
+
+config = {"latency": 0.2, "fail_rate": 0.0}
+stats = {"calls": {}, "items_listed": 0}
+_item_ids = itertools.count(110000000000)
+
+app = FastAPI()
+
+
+def _reply(call_name: str, body: str, ack: str = "Success") -> Response:
+    xml = (f'<?xml version="1.0" encoding="UTF-8"?><{call_name}Response xmlns="{NS}">'
+           f"<Ack>{ack}</Ack>{body}</{call_name}Response>")
+    return Response(content=xml, media_type="text/xml")
+
+
+def _error(message: str) -> str:
+    return (f"<Errors><ShortMessage>{message}</ShortMessage><LongMessage>{message}</LongMessage>"
+            "<SeverityCode>Error</SeverityCode></Errors>")
+
+
+def _list_item() -> str:
+    if random.random() < config["fail_rate"]:
+        return _error("Mock listing failure.")
+    stats["items_listed"] += 1
+    return f"<ItemID>{next(_item_ids)}</ItemID>"
+
+
+@app.post("/ws/api.dll")
+async def trading(request: Request):
+    call_name = request.headers.get("X-EBAY-API-CALL-NAME", "")
+    body = (await request.body()).decode("utf-8", errors="replace")
+    stats["calls"][call_name] = stats["calls"].get(call_name, 0) + 1
+    await asyncio.sleep(config["latency"])
+
+    if call_name == "UploadSiteHostedPictures":
+        url = f"https://i.ebayimg.sandbox.ebay.com/mock/{random.getrandbits(64):016x}.jpg"
+        return _reply(call_name, f"<SiteHostedPictureDetails><FullURL>{url}</FullURL></SiteHostedPictureDetails>")
+    if call_name == "AddItems":
+        containers = []
+        for message_id in re.findall(r"<MessageID>([^<]*)</MessageID>", body):
+            containers.append(
+                f"<AddItemResponseContainer><CorrelationID>{message_id}</CorrelationID>"
+                f"{_list_item()}</AddItemResponseContainer>")
+        ack = "Success" if all("<ItemID>" in c for c in containers) else "PartialFailure"
+        return _reply(call_name, "".join(containers), ack)
+    if call_name == "AddItem":
+        result = _list_item()
+        return _reply(call_name, result, "Success" if "<ItemID>" in result else "Failure")
+    if call_name in ("VerifyAddItem", "EndItem"):
+        return _reply(call_name, "")
+    if call_name == "GetItem":
+        item_id = re.search(r"<ItemID>([^<]*)</ItemID>", body)
+        item_id = item_id.group(1) if item_id else ""
+        return _reply(call_name, (
+            f"<Item><ItemID>{item_id}</ItemID><ListingDetails><ViewItemURL>"
+            f"https://sandbox.ebay.com/itm/{item_id}</ViewItemURL></ListingDetails>"
+            "<SellingStatus><ListingStatus>Active</ListingStatus></SellingStatus></Item>"))
+    return _reply(call_name or "Unknown", _error(f"Unsupported call {call_name!r}."), "Failure")
+
+
+@app.post("/identity/v1/oauth2/token")
+async def oauth_token():
+    stats["calls"]["token"] = stats["calls"].get("token", 0) + 1
+    await asyncio.sleep(config["latency"])
+    return {"access_token": f"mock-{random.getrandbits(64):016x}", "expires_in": 7200,
+            "token_type": "Application Access Token"}
+
+
+@app.get("/buy/browse/v1/item_summary/search")
+async def browse_search(q: str = "", limit: int = 10):
+    stats["calls"]["search"] = stats["calls"].get("search", 0) + 1
+    await asyncio.sleep(config["latency"])
+    if random.random() < config["fail_rate"]:
+        raise HTTPException(status_code=500, detail="Mock search failure.")
+    digest = hashlib.sha256(q.lower().encode()).digest()
+    base_price = 20 + digest[0] * 2
+    summaries = []
+    for i in range(min(limit, 3 + digest[1] % 8)):
+        summaries.append({
+            "itemId": f"v1|{digest[:4].hex()}{i:02d}|0",
+            "title": f"{q} #{i + 1}",
+            "price": {"value": f"{base_price * (0.7 + digest[2 + i] / 425):.2f}", "currency": "USD"},
+            "condition": "Used" if digest[12 + i] % 3 else "New",
+            "shippingOptions": [{"shippingCost": {"value": f"{digest[22 + i] % 15:.2f}", "currency": "USD"}}],
+            "buyingOptions": ["FIXED_PRICE"] if digest[12 + i] % 4 else ["AUCTION"],
+        })
+    return {"total": len(summaries), "limit": limit, "itemSummaries": summaries}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def configure(latency: float = 0.2, fail_rate: float = 0.0):
+    config["latency"] = latency
+    config["fail_rate"] = fail_rate
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local mock of the eBay APIs.")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    configure(args.latency, args.fail_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,15 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py main:app
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+# Analysis calls can take a while; don't let gunicorn kill a busy worker
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Workers are separate processes; share the token and caches between them
+if workers > 1:
+    os.environ.setdefault("STATE_BACKEND", "sqlite")
@@ -0,0 +1,471 @@
+import json
+import os
+import re
+
+from fastapi import HTTPException
+
+from lib.analysis_cache import analysis_cache, image_digest
+from lib.comparables import format_comparables_table
+from lib.image_prep import prepare_image
+from lib.uploads import read_source
+from lib.drafts import draft_store
+from lib.phash import near_duplicate_index
+from lib.comparables_cache import comparables_cache, normalize_query
+from lib.ebay import search_comparables
+from lib.governor import model_governor, MODEL_MAX_RETRIES
+from lib.model_backends import FunctionResponse, ImagePart
+
+MAX_RETRIES = MODEL_MAX_RETRIES
+MAX_TOOL_CALLS = 3
+
+# When eBay is down (or its circuit is open), price from cached comparables of
+# any age, or from the identify step alone, instead of failing the request
+EBAY_DEGRADED_MODE = os.environ.get("EBAY_DEGRADED_MODE", "1") == "1"
+degraded_stats = {"cachedComparables": 0, "noComparables": 0}
+
+# "two_pass" runs identify and price as two model calls with the eBay search in
+# between; "fused" runs one model session that calls search_comparables itself.
+ANALYSIS_MODES = ("two_pass", "fused")
+ANALYSIS_MODE = os.environ.get("ANALYSIS_MODE", "two_pass")
+
+
+PROMPT_IDENTIFY = """
+    You are an expert e-commerce analyst. Your task is to identify the item in the image and provide structured data about it.
+    The primary goal is to extract hyper-specific keywords for a market analysis. Include model numbers, series, or any unique identifiers visible.
+    You MUST respond with ONLY a valid JSON object. Do not include any other text, explanations, or markdown formatting.
+
+    Use the following JSON schema:
+    {
+    "item": "The most likely name of the item, including series or model if possible.",
+    "brand": "The brand of the item, or 'Unknown' if not identifiable.",
+    "description": "A concise, one-sentence description of the item.",
+    "imageQuality": "A classification of the image quality (Excellent, Good, Fair, Poor).",
+    "searchKeywords": [
+        "A list of 3-5 precise string keywords for finding this EXACT item on a marketplace."
+    ],
+    "condition": "Item condition based on visual inspection (e.g., 'New', 'Used - Like New', 'Used - Good', 'For parts')."
+    }
+    """
+
+PROMPT_FUSED = """
+    You are an expert e-commerce analyst and price analyst. Identify the item in the image, then price it.
+
+    1. Identify the item and extract 3-5 hyper-specific keywords for finding this EXACT item on a marketplace
+       (model numbers, series, or any unique identifiers visible).
+    2. Call the search_comparables function with those keywords to get comparable eBay listings.
+    3. Considering the item's visible condition compared to the listings, provide a realistic price range and a
+       suggested price. Ignore irrelevant listings.
+
+    Your final answer MUST be ONLY a valid JSON object. Do not include any other text, explanations, or markdown formatting.
+
+    Use the following JSON schema:
+    {
+    "item": "The most likely name of the item, including series or model if possible.",
+    "brand": "The brand of the item, or 'Unknown' if not identifiable.",
+    "description": "A concise, one-sentence description of the item.",
+    "imageQuality": "A classification of the image quality (Excellent, Good, Fair, Poor).",
+    "searchKeywords": ["The keywords you searched with."],
+    "condition": "Item condition based on visual inspection (e.g., 'New', 'Used - Like New', 'Used - Good', 'For parts').",
+    "estimatedPrice": {"min": 0.0, "max": 0.0, "suggested": 0.0}
+    }
+    """
+
+SEARCH_COMPARABLES_DECLARATION = {
+    "name": "search_comparables",
+    "description": "Searches eBay for active listings comparable to the item. "
+                   "Returns one listing per row: title, price, currency, condition, shipping, buying options.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "searchKeywords": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "3-5 precise keywords for finding this exact item.",
+            },
+        },
+        "required": ["searchKeywords"],
+    },
+}
+
+
+REQUIRED_FIELDS = ("item", "brand", "description", "searchKeywords", "condition", "estimatedPrice", "imageQuality")
+IDENTIFY_FIELDS = tuple(field for field in REQUIRED_FIELDS if field != "estimatedPrice")
+PRICE_FIELDS = ("min", "max", "suggested")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def analysis_problems(result, fields=REQUIRED_FIELDS) -> list:
+    """
+    Checks a model answer against the fields of ImageAnalysisResponse and returns
+    what is wrong with it, or an empty list if it is complete.
+    """
+    if not isinstance(result, dict):
+        return [f"expected a JSON object, got {type(result).__name__}"]
+    problems = []
+    for field in fields:
+        value = result.get(field)
+        if value is None:
+            problems.append(f"missing {field}")
+        elif field == "searchKeywords":
+            if not isinstance(value, list) or not all(isinstance(keyword, str) for keyword in value):
+                problems.append("searchKeywords is not a list of strings")
+        elif field == "estimatedPrice":
+            if not isinstance(value, dict) or not all(_is_number(value.get(key)) for key in PRICE_FIELDS):
+                problems.append("estimatedPrice needs numeric min, max and suggested")
+        elif not isinstance(value, str):
+            problems.append(f"{field} is not a string")
+    return problems
+
+
+class AnalysisInput:
+    """
+    An upload ready for analysis: its cache key, the model image part and its
+    perceptual hash, or the cached response if it was already analyzed.
+    listing_image is the eBay-sized JPEG, when it was asked for (drafts), and
+    draft_id an existing draft for the same photo, which makes it unnecessary.
+    """
+
+    def __init__(self, cache_key: str, image_part=None, image_hash: int | None = None, cached_response=None,
+                 listing_image: bytes | None = None, draft_id: str | None = None):
+        self.cache_key = cache_key
+        self.image_part = image_part
+        self.image_hash = image_hash
+        self.cached_response = cached_response
+        self.listing_image = listing_image
+        self.draft_id = draft_id
+
+
+async def _listing_image(image_data: bytes | str) -> bytes:
+    try:
+        prepared = await prepare_image(image_data, targets=("ebay",), with_hash=False)
+        return prepared.variants["ebay"]
+    except Exception as e:
+        print(f"Could not preprocess image, keeping original for the listing: {e}")
+        return read_source(image_data)
+
+
+async def _reuse_draft(cache_key: str) -> str | None:
+    try:
+        return await draft_store.reuse(cache_key)
+    except Exception as e:
+        print(f"Could not look up draft: {e}")
+        return None
+
+
+async def prepare_analysis(image_data: bytes | str, content_type: str, digest: str | None = None,
+                           with_listing_image: bool = False) -> AnalysisInput:
+    """
+    Checks the exact and near-duplicate caches and preprocesses the image for the model.
+    image_data is the upload's bytes or the path of its spooled file; pass the
+    digest if it was already computed while the upload was read. With
+    with_listing_image, the eBay-sized variant is produced in the same decode.
+    """
+    # Re-uploads of the exact same photo skip the model and eBay entirely
+    cache_key = digest or image_digest(read_source(image_data))
+    cached_response = await analysis_cache.get(cache_key)
+    if cached_response is not None:
+        if not with_listing_image:
+            return AnalysisInput(cache_key, cached_response=cached_response)
+        # Identical bytes give an identical draft, so reuse it if it is still there
+        draft_id = await _reuse_draft(cache_key)
+        if draft_id is not None:
+            return AnalysisInput(cache_key, cached_response=cached_response, draft_id=draft_id)
+        return AnalysisInput(
+            cache_key, cached_response=cached_response, listing_image=await _listing_image(image_data))
+
+    # Decode once, downscale for the model (and eBay) and hash in the process pool
+    listing_image = None
+    try:
+        prepared = await prepare_image(image_data, targets=("model", "ebay") if with_listing_image else ("model",))
+        image_part = ImagePart(prepared.variants["model"], prepared.mime_type)
+        image_hash = prepared.image_hash
+        listing_image = prepared.variants.get("ebay")
+    except Exception as e:
+        print(f"Could not preprocess image, sending original: {e}")
+        original = read_source(image_data)
+        image_part = ImagePart(original, content_type)
+        image_hash = None
+        if with_listing_image:
+            listing_image = original
+
+    # A re-shot photo of an item we already analyzed reuses that analysis
+    if image_hash is not None:
+        near_duplicate = await near_duplicate_index.find(image_hash, analysis_cache)
+        if near_duplicate is not None:
+            _, cached_response = near_duplicate
+            await analysis_cache.set(cache_key, cached_response)
+            return AnalysisInput(cache_key, cached_response=cached_response, listing_image=listing_image)
+
+    return AnalysisInput(cache_key, image_part, image_hash, listing_image=listing_image)
+
+
+async def remember_analysis(analysis_input: AnalysisInput, final_response):
+    """
+    Caches a finished analysis for exact and near-duplicate re-uploads. An
+    incomplete answer is never cached; it fails the request with 503 instead.
+    """
+    problems = analysis_problems(final_response)
+    if problems:
+        print(f"Not caching incomplete analysis: {', '.join(problems)}")
+        raise HTTPException(
+            status_code=503, detail="The model returned an incomplete analysis. Please try again.")
+    await analysis_cache.set(analysis_input.cache_key, final_response)
+    if analysis_input.image_hash is not None:
+        near_duplicate_index.add(analysis_input.image_hash, analysis_input.cache_key)
+
+
+def build_price_prompt(initial_analysis_json, comparables):
+    if comparables:
+        market_data = f"""**Comparable eBay Listings (Market Data, one listing per row, prices in the listed currency):**
+    ```
+    {format_comparables_table(comparables)}
+    ```"""
+    else:
+        market_data = """**Comparable eBay Listings:** None are available right now.
+    Base the estimate on your own knowledge of current resale prices for this item."""
+
+    return f"""
+    You are an expert e-commerce price analyst. Your task is to provide a price estimate for the item shown in the image,
+    based on its description and a list of comparable items found on eBay.
+
+    Analyze the provided item information, the image itself (paying attention to condition), and the market data.
+    Consider how the item's condition compares to the listings. Provide a realistic price range and a suggested price. Ignore irrelevant listings.
+
+    You MUST respond with ONLY a valid JSON object. Do not include any other text, explanations, or markdown formatting.
+
+    **Item to be Priced:**
+    ```json
+    {json.dumps(initial_analysis_json, indent=2)}
+    ```
+
+    {market_data}
+
+    **Required Output JSON Schema:**
+    {{
+      "estimatedPrice": {{
+        "min": 0.0,
+        "max": 0.0,
+        "suggested": 0.0
+      }}
+    }}
+    """
+
+
+def parse_json_response(text: str):
+    """
+    Parses a model reply as JSON, tolerating a ```json fenced block around it.
+    """
+    match = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    return json.loads(match.group(1) if match else text)
+
+
+async def identify_item(model, image_part):
+    """
+    Identify stage: returns the item, brand, description, keywords and condition.
+    """
+    async def request():
+        initial_analysis_json = json.loads(await model.generate_json([image_part, PROMPT_IDENTIFY]))
+        problems = analysis_problems(initial_analysis_json, IDENTIFY_FIELDS)
+        if problems:
+            raise ValueError(f"Identify response is incomplete: {', '.join(problems)}")
+        return initial_analysis_json
+
+    try:
+        return await model_governor.call(request, retries=MAX_RETRIES)
+    except Exception as e:
+        print(f"An error occurred during identification: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"The model failed to identify the item after {MAX_RETRIES} attempts."
+        )
+
+async def search_with_fallback(keywords):
+    """
+    Searches eBay for comparables. In degraded mode a failed search (including
+    an open circuit) falls back to cached comparables or an empty list.
+    """
+    search_query = normalize_query(keywords)
+    try:
+        comparables = await search_comparables(search_query, limit=10)
+        print(f"Found {len(comparables)} eBay comparables for '{search_query}'")
+        return comparables
+    except Exception as e:
+        print(f"Error searching eBay: {e}")
+        if not EBAY_DEGRADED_MODE:
+            raise
+        comparables = await comparables_cache.peek(search_query)
+        if comparables is not None:
+            degraded_stats["cachedComparables"] += 1
+            print(f"Pricing '{search_query}' from cached comparables")
+            return comparables
+        degraded_stats["noComparables"] += 1
+        print(f"Pricing '{search_query}' without comparables")
+        return []
+
+
+async def find_comparables(initial_analysis_json):
+    """
+    Search stage: looks up eBay comparables for the identified searchKeywords.
+    """
+    search_query = normalize_query(initial_analysis_json.get("searchKeywords", []))
+    if not search_query:
+        raise HTTPException(
+            status_code=400, detail="Could not generate search keywords from image.")
+
+    try:
+        return await search_with_fallback(search_query)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to fetch listings from eBay: {e}")
+
+async def estimate_price(model, image_part, initial_analysis_json, comparables):
+    """
+    Price stage: returns {"estimatedPrice": {...}} for the identified item.
+    """
+    prompt_2_price = build_price_prompt(initial_analysis_json, comparables)
+
+    async def request():
+        price_analysis_json = json.loads(await model.generate_json([image_part, prompt_2_price]))
+        problems = analysis_problems(price_analysis_json, ("estimatedPrice",))
+        if problems:
+            raise ValueError(f"Price response is incomplete: {', '.join(problems)}")
+        return price_analysis_json
+
+    try:
+        return await model_governor.call(request, retries=MAX_RETRIES)
+    except Exception as e:
+        print(f"An error occurred during price estimation: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"The model failed to generate a price estimate after {MAX_RETRIES} attempts."
+        )
+
+
+async def analyze_two_pass(model, image_part):
+    initial_analysis_json = await identify_item(model, image_part)
+    comparables = await find_comparables(initial_analysis_json)
+    price_analysis_json = await estimate_price(model, image_part, initial_analysis_json, comparables)
+
+    # Merge the initial analysis with the price analysis
+    final_response = initial_analysis_json
+    final_response.update(price_analysis_json) # This adds the 'estimatedPrice' key
+    return final_response
+
+
+async def _run_fused_session(model, image_part):
+    session = model.start_tool_session([SEARCH_COMPARABLES_DECLARATION])
+    response = await model_governor.call(lambda: session.send([image_part, PROMPT_FUSED]))
+
+    for _ in range(MAX_TOOL_CALLS):
+        function_calls = response.function_calls
+        if not function_calls:
+            break
+        function_responses = []
+        for call in function_calls:
+            keywords = list(call.args.get("searchKeywords", []))
+            try:
+                comparables = await search_with_fallback(keywords)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500, detail=f"Failed to fetch listings from eBay: {e}")
+            function_responses.append(FunctionResponse(
+                name=call.name, response={"content": format_comparables_table(comparables)}))
+        response = await model_governor.call(lambda: session.send(function_responses))
+
+    if response.function_calls:
+        raise ValueError(f"Fused session still calling functions after {MAX_TOOL_CALLS} rounds")
+
+    result = parse_json_response(response.text)
+    problems = analysis_problems(result)
+    if problems:
+        raise ValueError(f"Fused response is incomplete: {', '.join(problems)}")
+    return result
+
+
+async def analyze_fused(model, image_part):
+    """
+    Runs identify, eBay search and pricing in one model session: the model asks
+    for comparables through function calling mid-generation. Falls back to the
+    two-pass pipeline if the session doesn't produce a complete answer. Model
+    errors (throttling, governor timeouts) fail with 503 instead, since two-pass
+    would only add more calls to an overloaded model.
+    """
+    try:
+        return await _run_fused_session(model, image_part)
+    except ValueError as e:
+        # Malformed JSON, missing fields or too many tool calls
+        print(f"Fused analysis failed, falling back to two-pass: {e}")
+        return await analyze_two_pass(model, image_part)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"An error occurred during fused analysis: {e}")
+        raise HTTPException(
+            status_code=503, detail="The model failed to analyze the item. Please try again later.")
+
+
+async def run_analysis(model, image_part, mode: str = ANALYSIS_MODE):
+    if mode == "fused":
+        return await analyze_fused(model, image_part)
+    return await analyze_two_pass(model, image_part)
+
+
+async def stream_analysis(model, image_part, mode: str = ANALYSIS_MODE):
+    """
+    Yields (stage, data) as each stage finishes: "identify", "comparables" and
+    "price" for the two-pass pipeline, then "result" with the merged analysis.
+    The fused pipeline has no intermediate stages, so it only yields "result".
+    """
+    if mode == "fused":
+        yield "result", await analyze_fused(model, image_part)
+        return
+
+    initial_analysis_json = await identify_item(model, image_part)
+    yield "identify", dict(initial_analysis_json)
+
+    comparables = await find_comparables(initial_analysis_json)
+    yield "comparables", [comparable.to_dict() for comparable in comparables]
+
+    price_analysis_json = await estimate_price(model, image_part, initial_analysis_json, comparables)
+    yield "price", price_analysis_json
+
+    final_response = initial_analysis_json
+    final_response.update(price_analysis_json)
+    yield "result", final_response
+
+
+async def analyze_image_bytes(model, image_data: bytes | str, content_type: str, mode: str = ANALYSIS_MODE,
+                              digest: str | None = None, with_draft: bool = False):
+    """
+    Full pipeline for one upload, including the caches. Used by /analyze-image/,
+    the job queue and the batch endpoint. With with_draft, the eBay-sized image
+    and the analysis are saved as a draft and its id is returned as draftId.
+    """
+    analysis_input = await prepare_analysis(image_data, content_type, digest, with_listing_image=with_draft)
+    if analysis_input.cached_response is not None:
+        final_response = analysis_input.cached_response
+    else:
+        final_response = await run_analysis(model, analysis_input.image_part, mode)
+        await remember_analysis(analysis_input, final_response)
+
+    if with_draft:
+        return await save_draft(analysis_input, final_response)
+    return final_response
+
+
+async def save_draft(analysis_input: AnalysisInput, final_response):
+    """
+    Stores the listing image and analysis as a draft and returns the response
+    with its draftId. Cached responses are shared, so this returns a copy.
+    """
+    if analysis_input.draft_id is not None:
+        return {**final_response, "draftId": analysis_input.draft_id}
+    try:
+        draft_id = await draft_store.create(analysis_input.listing_image, final_response, analysis_input.cache_key)
+    except Exception as e:
+        print(f"Could not save draft: {e}")
+        return final_response
+    return {**final_response, "draftId": draft_id}
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from lib.shared_state import shared_state
+
+ANALYSIS_CACHE_SIZE = int(os.environ.get("ANALYSIS_CACHE_SIZE", 512))
+ANALYSIS_CACHE_TTL = float(os.environ.get("ANALYSIS_CACHE_TTL", 24 * 60 * 60))
+ANALYSIS_CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR")
+
+
+def image_digest(image_data: bytes) -> str:
+    """
+    Returns the content hash used as the cache key for an uploaded image.
+    """
+    return hashlib.sha256(image_data).hexdigest()
+
+
+class MemoryTier:
+    """
+    In-process LRU tier. Entries are (expires_at, value) pairs.
+    """
+
+    def __init__(self, max_entries: int = ANALYSIS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskTier:
+    """
+    Optional on-disk tier. One JSON file per key, sharded by the first two hex chars.
+    File I/O blocks, so it is done from a worker thread.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    # --- Blocking file operations, run via asyncio.to_thread ---
+
+    def _read(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry["expires_at"] <= time.time():
+            self._remove(key)
+            return None
+        return entry["value"]
+
+    def _write(self, key: str, value, ttl: float):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": time.time() + ttl, "value": value}, f)
+        # Atomic rename so concurrent readers never see a half-written entry
+        os.replace(tmp_path, path)
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def get(self, key: str):
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value, ttl: float):
+        await asyncio.to_thread(self._write, key, value, ttl)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
+
+
+class SharedTier:
+    """
+    Tier on the shared state backend, so every worker sees the others' results.
+    The backend blocks (SQLite, Redis), so it is called from a worker thread.
+    """
+
+    def __init__(self, backend, prefix: str = "analysis:"):
+        self.backend = backend
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        return await asyncio.to_thread(self.backend.get, self.prefix + key)
+
+    async def set(self, key: str, value, ttl: float):
+        await asyncio.to_thread(self.backend.set, self.prefix + key, value, ttl)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.backend.delete, self.prefix + key)
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache for /analyze-image/ results, keyed by image_digest().
+    Looks in the memory tier first, then the disk tier (if configured), then
+    the shared tier (if the state backend is shared), and promotes hits from
+    the lower tiers back into memory.
+    """
+
+    def __init__(self, memory: MemoryTier, disk: DiskTier | None = None, ttl: float = ANALYSIS_CACHE_TTL,
+                 shared: SharedTier | None = None):
+        self.memory = memory
+        self.disk = disk
+        self.shared = shared
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, count: bool = True):
+        """
+        Returns the cached value or None. With count=False the lookup is left
+        out of the hit/miss stats (used for near-duplicate candidates).
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += count
+            return value
+
+        if self.disk is not None:
+            value = await self.disk.get(key)
+            if value is not None:
+                self.hits += count
+                self.disk_hits += count
+                self.memory.set(key, value, self.ttl)
+                return value
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except Exception as e:
+                print(f"Could not read analysis cache entry from shared state: {e}")
+                value = None
+            if value is not None:
+                self.hits += count
+                self.shared_hits += count
+                self.memory.set(key, value, self.ttl)
+                return value
+
+        self.misses += count
+        return None
+
+    async def set(self, key: str, value):
+        self.memory.set(key, value, self.ttl)
+        if self.disk is not None:
+            try:
+                await self.disk.set(key, value, self.ttl)
+            except OSError as e:
+                print(f"Could not write analysis cache entry to disk: {e}")
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value, self.ttl)
+            except Exception as e:
+                print(f"Could not write analysis cache entry to shared state: {e}")
+
+    async def delete(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            await self.disk.delete(key)
+        if self.shared is not None:
+            await self.shared.delete(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "diskHits": self.disk_hits,
+            "sharedHits": self.shared_hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+
+analysis_cache = AnalysisCache(
+    MemoryTier(ANALYSIS_CACHE_SIZE),
+    DiskTier(ANALYSIS_CACHE_DIR) if ANALYSIS_CACHE_DIR else None,
+    shared=SharedTier(shared_state) if shared_state.shared else None,
+)
@@ -0,0 +1,75 @@
+import io
+import mimetypes
+import os
+import zipfile
+
+from fastapi import HTTPException
+
+from lib.uploads import UPLOAD_MAX_BYTES
+
+BATCH_MAX_IMAGES = int(os.environ.get("BATCH_MAX_IMAGES", 200))
+# Total decompressed size of the images taken from one zip archive
+BATCH_MAX_ARCHIVE_BYTES = int(os.environ.get("BATCH_MAX_ARCHIVE_BYTES", 512 * 1024 * 1024))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".heic", ".heif", ".webp")
+
+
+class ZipMember:
+    """
+    An image inside a batch archive. It is decompressed only when read(), one
+    item at a time as the batch reaches it, so a large archive is never held
+    in memory as a whole.
+    """
+
+    def __init__(self, archive_data: bytes | str, info: zipfile.ZipInfo, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.archive_data = archive_data
+        self.info = info
+        self.max_bytes = max_bytes
+
+    def read(self) -> bytes:
+        """
+        Decompresses the image. Blocking, so call it through asyncio.to_thread.
+        The read is capped at max_bytes in case the size in the archive lies.
+        """
+        source = self.archive_data if isinstance(self.archive_data, str) else io.BytesIO(self.archive_data)
+        with zipfile.ZipFile(source) as archive, archive.open(self.info) as member:
+            data = member.read(self.max_bytes + 1)
+        if len(data) > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{self.info.filename} is larger than {self.max_bytes // (1024 * 1024)} MB.")
+        return data
+
+
+def list_zip_images(archive_data: bytes | str, max_images: int = BATCH_MAX_IMAGES,
+                    max_bytes: int = UPLOAD_MAX_BYTES, max_total_bytes: int = BATCH_MAX_ARCHIVE_BYTES):
+    """
+    Returns (filename, content_type, ZipMember) for every image in a zip
+    archive (bytes or a file path), skipping directories, non-images and macOS
+    resource forks. Only the archive's directory is read here; the archive
+    must stay available until the members have been read.
+    Stops after max_images + 1 so an oversized batch is rejected without
+    listing the whole archive. Images over max_bytes, or more than
+    max_total_bytes in all, are rejected with a 413.
+    """
+    members = []
+    total_bytes = 0
+    source = archive_data if isinstance(archive_data, str) else io.BytesIO(archive_data)
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or "__MACOSX" in name or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if info.file_size > max_bytes:
+                raise HTTPException(
+                    status_code=413, detail=f"{name} is larger than {max_bytes // (1024 * 1024)} MB.")
+            total_bytes += info.file_size
+            if total_bytes > max_total_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"The archive's images are larger than {max_total_bytes // (1024 * 1024)} MB in total.")
+            content_type = mimetypes.guess_type(name)[0] or "image/heic"
+            members.append((os.path.basename(name), content_type, ZipMember(archive_data, info, max_bytes)))
+            if len(members) > max_images:
+                break
+    return members
@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+from lib.trading_async import upload_picture, add_items
+
+ADD_ITEMS_BATCH_SIZE = 5  # AddItems accepts at most 5 items per call
+BULK_UPLOAD_CONCURRENCY = int(os.environ.get("BULK_UPLOAD_CONCURRENCY", 8))
+BULK_ADD_CONCURRENCY = int(os.environ.get("BULK_ADD_CONCURRENCY", 4))
+
+
+async def publish_listings(listings, build_item):
+    """
+    Publishes many listings at once. Each listing is a dict with at least
+    "image_data"; build_item(listing, picture_url) returns its Trading API Item.
+    Pictures are uploaded concurrently, then items are listed in AddItems
+    batches of 5. Returns one result per listing, in input order, with either
+    "itemId" or "error".
+    """
+    results = [None] * len(listings)
+    upload_slots = asyncio.Semaphore(BULK_UPLOAD_CONCURRENCY)
+    add_slots = asyncio.Semaphore(BULK_ADD_CONCURRENCY)
+
+    async def upload(index, listing):
+        async with upload_slots:
+            try:
+                return await upload_picture(listing["image_data"], picture_name=f"ListingImage{index}")
+            except Exception as e:
+                results[index] = {"index": index, "error": f"Picture upload failed: {e}"}
+                return None
+
+    picture_urls = await asyncio.gather(*(upload(i, listing) for i, listing in enumerate(listings)))
+
+    ready = [i for i, url in enumerate(picture_urls) if url is not None]
+    batches = [ready[i:i + ADD_ITEMS_BATCH_SIZE] for i in range(0, len(ready), ADD_ITEMS_BATCH_SIZE)]
+
+    async def add_batch(batch):
+        async with add_slots:
+            try:
+                outcomes = await add_items([build_item(listings[i], picture_urls[i]) for i in batch])
+            except Exception as e:
+                outcomes = [(None, f"AddItems failed: {e}")] * len(batch)
+        for index, (item_id, error) in zip(batch, outcomes):
+            if item_id:
+                results[index] = {"index": index, "itemId": item_id,
+                                  "listingUrl": f"https://sandbox.ebay.com/itm/{item_id}"}
+            else:
+                results[index] = {"index": index, "error": error}
+
+    await asyncio.gather(*(add_batch(batch) for batch in batches))
+    return results
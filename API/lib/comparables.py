@@ -0,0 +1,92 @@
+MAX_TITLE_LENGTH = 80
+
+
+class Comparable:
+    """
+    The handful of Browse item summary fields the price model actually uses.
+    """
+
+    __slots__ = ("title", "price", "currency", "condition", "shipping", "buying_options")
+
+    def __init__(self, title: str, price: float | None, currency: str, condition: str,
+                 shipping: float | None, buying_options: tuple):
+        self.title = title
+        self.price = price
+        self.currency = currency
+        self.condition = condition
+        self.shipping = shipping
+        self.buying_options = buying_options
+
+    def to_dict(self):
+        return {
+            "title": self.title,
+            "price": self.price,
+            "currency": self.currency,
+            "condition": self.condition,
+            "shipping": self.shipping,
+            "buyingOptions": list(self.buying_options),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["title"], data["price"], data["currency"], data["condition"],
+                   data["shipping"], tuple(data["buyingOptions"]))
+
+
+def _amount(money):
+    if not money:
+        return None
+    try:
+        return float(money.get("value"))
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_comparables(payload):
+    """
+    Single pass over a Browse item_summary/search response, yielding one
+    Comparable per listing and skipping everything else (hrefs, images, seller).
+    """
+    for summary in (payload or {}).get("itemSummaries", ()):
+        price = summary.get("price") or {}
+        shipping = None
+        for option in summary.get("shippingOptions", ()):
+            shipping = _amount(option.get("shippingCost"))
+            if shipping is not None:
+                break
+        yield Comparable(
+            title=summary.get("title", ""),
+            price=_amount(price),
+            currency=price.get("currency", ""),
+            condition=summary.get("condition", ""),
+            shipping=shipping,
+            buying_options=tuple(summary.get("buyingOptions", ())),
+        )
+
+
+def _cell(value) -> str:
+    if value is None:
+        return "?"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def format_comparables_table(comparables) -> str:
+    """
+    Compact pipe-separated table for the price prompt.
+    """
+    lines = ["title|price|currency|condition|shipping|buying"]
+    for comparable in comparables:
+        title = comparable.title
+        if len(title) > MAX_TITLE_LENGTH:
+            title = title[:MAX_TITLE_LENGTH - 1] + "…"
+        lines.append("|".join((
+            _cell(title),
+            _cell(comparable.price),
+            _cell(comparable.currency),
+            _cell(comparable.condition),
+            _cell(comparable.shipping),
+            _cell(",".join(comparable.buying_options)),
+        )))
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from lib.comparables import Comparable
+from lib.shared_state import shared_state
+
+COMPARABLES_CACHE_SIZE = int(os.environ.get("COMPARABLES_CACHE_SIZE", 2048))
+# Entries younger than the TTL are served as-is; older ones are still served
+# (and refreshed in the background) until they are COMPARABLES_STALE_TTL old.
+COMPARABLES_TTL = float(os.environ.get("COMPARABLES_TTL", 15 * 60))
+COMPARABLES_STALE_TTL = float(os.environ.get("COMPARABLES_STALE_TTL", 6 * 60 * 60))
+
+
+def normalize_query(keywords) -> str:
+    """
+    Turns Gemini's searchKeywords into a canonical query: lower-cased,
+    de-duplicated and sorted words, so equivalent keyword lists share an entry.
+    """
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    words = {word for keyword in keywords for word in keyword.lower().split()}
+    return " ".join(sorted(words))
+
+
+class ComparablesCache:
+    """
+    Size-bounded LRU of eBay search results with stale-while-revalidate.
+    Concurrent misses or refreshes for the same query share one fetch.
+    With a shared state backend, fetched results are published there too and
+    a local miss is served from another worker's fetch, keeping its age.
+    """
+
+    def __init__(self, max_entries: int = COMPARABLES_CACHE_SIZE, ttl: float = COMPARABLES_TTL,
+                 stale_ttl: float = COMPARABLES_STALE_TTL, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.shared_hits = 0
+
+    def _store(self, key: str, value, fetched_at: float | None = None):
+        fetched_at = fetched_at or time.time()
+        self._entries[key] = (fetched_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return fetched_at
+
+    async def _publish(self, key: str, value, fetched_at: float):
+        # The shared backend blocks (SQLite, Redis), so it is called from a worker thread
+        try:
+            await asyncio.to_thread(self.shared.set, f"comparables:{key}", {
+                "fetchedAt": fetched_at,
+                "comparables": [comparable.to_dict() for comparable in value],
+            }, self.stale_ttl)
+        except Exception as e:
+            print(f"Could not write comparables for '{key}' to shared state: {e}")
+
+    async def _entry(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None or self.shared is None:
+            return entry
+        try:
+            data = await asyncio.to_thread(self.shared.get, f"comparables:{key}")
+        except Exception as e:
+            print(f"Could not read comparables for '{key}' from shared state: {e}")
+            return None
+        if data is None:
+            return None
+        self.shared_hits += 1
+        value = [Comparable.from_dict(comparable) for comparable in data["comparables"]]
+        self._store(key, value, data["fetchedAt"])
+        return self._entries[key]
+
+    def _fetch_once(self, key: str, fetch):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            self._inflight[key] = task
+        return task
+
+    async def _fetch(self, key: str, fetch):
+        try:
+            value = await fetch(key)
+            fetched_at = self._store(key, value)
+            if self.shared is not None:
+                await self._publish(key, value, fetched_at)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _refresh(self, key: str, fetch):
+        try:
+            await self._fetch_once(key, fetch)
+            self.refreshes += 1
+        except Exception as e:
+            self.refresh_failures += 1
+            print(f"Background refresh of comparables for '{key}' failed: {e}")
+
+    async def peek(self, key: str):
+        """
+        Returns the cached value regardless of age, or None. Used as a fallback
+        when eBay is unavailable.
+        """
+        entry = await self._entry(key)
+        return entry[1] if entry is not None else None
+
+    async def get(self, key: str, fetch):
+        """
+        Returns comparables for a normalized query, calling fetch(key) on a miss.
+        """
+        entry = await self._entry(key)
+        if entry is not None:
+            fetched_at, value = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    asyncio.ensure_future(self._refresh(key, fetch))
+                return value
+            # Too old to serve, but kept for peek() until the refetch replaces it
+
+        self.misses += 1
+        return await asyncio.shield(self._fetch_once(key, fetch))
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "hitRate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refreshFailures": self.refresh_failures,
+            "sharedHits": self.shared_hits,
+            "entries": len(self._entries),
+        }
+
+
+comparables_cache = ComparablesCache(shared=shared_state if shared_state.shared else None)
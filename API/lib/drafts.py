@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+
+DRAFTS_DB = os.environ.get("DRAFTS_DB", "drafts.db")
+DRAFT_TTL = float(os.environ.get("DRAFT_TTL", 24 * 60 * 60))
+
+
+class Draft:
+    def __init__(self, draft_id: str, image: bytes, analysis: dict, picture_url: str | None):
+        self.id = draft_id
+        self.image = image
+        self.analysis = analysis
+        self.picture_url = picture_url
+
+
+class DraftStore:
+    """
+    Server-side drafts created by /analyze-image/: the eBay-sized JPEG plus the
+    analysis, so /post/ can publish by draft id without the app uploading the
+    photo again. Once a draft's picture is hosted on EPS its URL is kept, so
+    publishing the same draft again skips the upload. Drafts are keyed by the
+    image digest too, so re-uploads of the same photo reuse the existing draft.
+    Drafts expire after DRAFT_TTL seconds (reuse extends that); expired ones
+    are purged whenever a draft is created. Backed by SQLite, so all workers on
+    the machine share it.
+    """
+
+    def __init__(self, db_path: str = DRAFTS_DB, ttl: float = DRAFT_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.published = 0
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None)) as conn:
+            if not self._initialized:
+                with self._init_lock:
+                    if not self._initialized:
+                        self._init_db(conn)
+                        self._initialized = True
+            yield conn
+
+    def _init_db(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS drafts (
+                id TEXT PRIMARY KEY,
+                image BLOB NOT NULL,
+                analysis TEXT NOT NULL,
+                picture_url TEXT,
+                expires_at REAL NOT NULL,
+                digest TEXT
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS drafts_expires_at ON drafts (expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS drafts_digest ON drafts (digest)")
+
+    # --- Blocking SQLite operations, run via asyncio.to_thread ---
+
+    def _insert(self, draft_id, image, analysis, digest):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO drafts (id, image, analysis, expires_at, digest) VALUES (?, ?, ?, ?, ?)",
+                (draft_id, image, json.dumps(analysis), now + self.ttl, digest))
+            conn.execute("DELETE FROM drafts WHERE expires_at < ?", (now,))
+
+    def _reuse(self, digest):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "UPDATE drafts SET expires_at = ? WHERE id = ("
+                "SELECT id FROM drafts WHERE digest = ? AND expires_at >= ? ORDER BY expires_at DESC LIMIT 1"
+                ") RETURNING id",
+                (now + self.ttl, digest, now)).fetchone()
+        return row[0] if row else None
+
+    def _get(self, draft_id):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT id, image, analysis, picture_url FROM drafts WHERE id = ? AND expires_at >= ?",
+                (draft_id, time.time())).fetchone()
+
+    def _set_picture_url(self, draft_id, picture_url):
+        with self._connect() as conn:
+            conn.execute("UPDATE drafts SET picture_url = ? WHERE id = ?", (picture_url, draft_id))
+
+    def _count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM drafts WHERE expires_at >= ?", (time.time(),)).fetchone()[0]
+
+    # --- Async API ---
+
+    async def create(self, image: bytes, analysis: dict, digest: str | None = None) -> str:
+        draft_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._insert, draft_id, image, analysis, digest)
+        self.created += 1
+        return draft_id
+
+    async def reuse(self, digest: str) -> str | None:
+        """
+        Returns the id of an active draft for the image digest, extending its
+        expiry, or None.
+        """
+        draft_id = await asyncio.to_thread(self._reuse, digest)
+        if draft_id is not None:
+            self.reused += 1
+        return draft_id
+
+    async def get(self, draft_id: str) -> Draft | None:
+        row = await asyncio.to_thread(self._get, draft_id)
+        if row is None:
+            return None
+        return Draft(row[0], row[1], json.loads(row[2]), row[3])
+
+    async def set_picture_url(self, draft_id: str, picture_url: str):
+        await asyncio.to_thread(self._set_picture_url, draft_id, picture_url)
+
+    async def stats(self):
+        return {
+            "active": await asyncio.to_thread(self._count),
+            "created": self.created,
+            "reused": self.reused,
+            "published": self.published,
+            "ttlSeconds": self.ttl,
+        }
+
+
+draft_store = DraftStore()
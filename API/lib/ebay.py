@@ -1,23 +1,59 @@
+import asyncio
 import httpx
 import base64
 import time
 from functools import lru_cache
 import os 
 from dotenv import load_dotenv
+from lib.http_client import get_http_client, request_timeout
+from lib.comparables_cache import comparables_cache, normalize_query
+from lib.comparables import iter_comparables
+from lib.resilience import CircuitBreaker, LatencyTracker, hedged
+from lib.shared_state import shared_state
 load_dotenv()
 
-SANDBOX_API_URL = "https://api.sandbox.ebay.com"
+# Point at bench/mock_ebay.py for load tests
+EBAY_API_URL = os.environ.get("EBAY_API_URL", "https://api.sandbox.ebay.com")
+
+TOKEN_REFRESH_MARGIN = float(os.environ.get("EBAY_TOKEN_REFRESH_MARGIN", 300))
+TOKEN_RETRY_DELAY = 5.0
 
 _token_cache = {"token": None, "expires_at": 0}
+# With a shared state backend, workers publish the token here and take a
+# short lock so only one of them refreshes it
+TOKEN_STATE_KEY = "ebay:app_token"
+TOKEN_LOCK_KEY = "ebay:app_token:refresh"
+TOKEN_LOCK_TTL = 30.0
+TOKEN_LOCK_POLL = 0.1
+
+EBAY_BREAKER_FAILURES = int(os.environ.get("EBAY_BREAKER_FAILURES", 5))
+EBAY_BREAKER_RESET = float(os.environ.get("EBAY_BREAKER_RESET", 30))
+# Send a second Browse request when the first is slower than this percentile
+EBAY_HEDGE_PERCENTILE = float(os.environ.get("EBAY_HEDGE_PERCENTILE", 0))
+# Caps concurrent Browse searches so a large batch can't flood eBay. Only cache
+# misses and background refreshes take a slot; cache hits never wait for one.
+EBAY_CONCURRENCY = int(os.environ.get("EBAY_CONCURRENCY", 4))
+ebay_slots = asyncio.Semaphore(EBAY_CONCURRENCY)
+
+
+def _is_ebay_failure(e: Exception) -> bool:
+    # 4xx responses mean eBay is up and answering; only 5xx, 429 and transport errors count
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500 or e.response.status_code == 429
+    return True
+
+
+browse_breaker = CircuitBreaker(
+    "eBay Browse", failure_threshold=EBAY_BREAKER_FAILURES, reset_timeout=EBAY_BREAKER_RESET,
+    is_failure=_is_ebay_failure)
+browse_latency = LatencyTracker()
+browse_hedges = {"sent": 0}
 
-def get_ebay_token():
+
+async def _fetch_ebay_token():
     """
-    Gets a valid eBay application token, using a cache to avoid re-fetching.
+    Requests a new application token from eBay's OAuth endpoint.
     """
-    now = time.time()
-    if _token_cache["token"] and _token_cache["expires_at"] > now + 60:
-        return _token_cache["token"]
-
     client_id = os.environ["CLIENT_ID"]
     client_secret = os.environ["CLIENT_SECRET"]
     creds = f"{client_id}:{client_secret}".encode()
@@ -32,33 +68,190 @@ def get_ebay_token():
         "scope": "https://api.ebay.com/oauth/api_scope",
     }
     
-    url = f"{SANDBOX_API_URL}/identity/v1/oauth2/token"
+    url = f"{EBAY_API_URL}/identity/v1/oauth2/token"
     
-    with httpx.Client() as client:
-        response = client.post(url, headers=headers, data=data)
-        response.raise_for_status()
-        token_data = response.json()
-        
-        _token_cache["token"] = token_data["access_token"]
-        _token_cache["expires_at"] = now + token_data["expires_in"]
-        
-        return _token_cache["token"]
+    now = time.time()
+    client = get_http_client()
+    response = await client.post(
+        url, headers=headers, data=data, timeout=request_timeout(url))
+    response.raise_for_status()
+    token_data = response.json()
+
+    _token_cache["token"] = token_data["access_token"]
+    _token_cache["expires_at"] = now + token_data["expires_in"]
+    if shared_state.shared:
+        await asyncio.to_thread(shared_state.set, TOKEN_STATE_KEY, dict(_token_cache), token_data["expires_in"])
+    return _token_cache["token"]
+
+
+class EbayTokenProvider:
+    """
+    Hands out the cached application token without touching the network in the
+    steady state. A background task refreshes it TOKEN_REFRESH_MARGIN seconds
+    before expiry, and concurrent callers that do find it expired all await the
+    same in-flight refresh instead of each requesting a new token.
+
+    With a shared state backend the token is shared by all workers: a worker
+    whose copy is expiring first looks for one another worker already fetched,
+    and only the worker holding the refresh lock calls eBay.
+    """
+
+    def __init__(self, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._inflight = None
+        self._background = None
+        self.refreshes = 0
+
+    async def _valid_token(self):
+        if _token_cache["token"] and _token_cache["expires_at"] > time.time() + 60:
+            return _token_cache["token"]
+        if shared_state.shared:
+            return await self._adopt_shared_token(60)
+        return None
+
+    async def _adopt_shared_token(self, min_lifetime: float):
+        """
+        Takes over a newer token from the shared state if it is valid for at
+        least min_lifetime more seconds.
+        """
+        entry = await asyncio.to_thread(shared_state.get, TOKEN_STATE_KEY)
+        if entry and entry["expires_at"] > max(_token_cache["expires_at"], time.time() + min_lifetime):
+            _token_cache.update(entry)
+            return entry["token"]
+        return None
+
+    async def _refresh(self):
+        try:
+            if shared_state.shared:
+                return await self._refresh_shared()
+            token = await _fetch_ebay_token()
+            self.refreshes += 1
+            return token
+        finally:
+            self._inflight = None
+
+    async def _refresh_shared(self):
+        token = await self._adopt_shared_token(self.refresh_margin)
+        if token:
+            return token
+        # Another worker is refreshing; wait for its token (the lock expires if it dies)
+        while not await asyncio.to_thread(shared_state.add, TOKEN_LOCK_KEY, os.getpid(), TOKEN_LOCK_TTL):
+            await asyncio.sleep(TOKEN_LOCK_POLL)
+            token = await self._adopt_shared_token(self.refresh_margin)
+            if token:
+                return token
+        try:
+            token = await self._adopt_shared_token(self.refresh_margin)
+            if token:
+                return token
+            token = await _fetch_ebay_token()
+            self.refreshes += 1
+            return token
+        finally:
+            await asyncio.to_thread(shared_state.delete, TOKEN_LOCK_KEY)
+
+    def _refresh_once(self):
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+        return self._inflight
+
+    async def get_token(self):
+        token = await self._valid_token()
+        if token:
+            return token
+        # shield() so one cancelled caller doesn't cancel the shared refresh
+        return await asyncio.shield(self._refresh_once())
+
+    async def _refresh_loop(self):
+        failures = 0
+        while True:
+            delay = _token_cache["expires_at"] - self.refresh_margin - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await asyncio.shield(self._refresh_once())
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                print(f"Background eBay token refresh failed: {e}")
+                await asyncio.sleep(min(TOKEN_RETRY_DELAY * 2 ** (failures - 1), self.refresh_margin))
+
+    def start(self):
+        """
+        Starts proactive background refreshing. Called from the FastAPI lifespan.
+        """
+        if self._background is None:
+            self._background = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._background is not None:
+            self._background.cancel()
+            try:
+                await self._background
+            except asyncio.CancelledError:
+                pass
+            self._background = None
+
+
+token_provider = EbayTokenProvider()
+
+
+async def get_ebay_token():
+    """
+    Gets a valid eBay application token, using a cache to avoid re-fetching.
+    """
+    return await token_provider.get_token()
 
 async def search_items(query: str, limit: int = 10):
     """
     Searches for items and returns a cleaned-up list.
     """
-    token = get_ebay_token()
-    url = f"{SANDBOX_API_URL}/buy/browse/v1/item_summary/search"
+    token = await get_ebay_token()
+    url = f"{EBAY_API_URL}/buy/browse/v1/item_summary/search"
     headers = {
         "Authorization": f"Bearer {token}",
         "X-EBAY-C-MARKETPLACE-ID": "EBAY_US",
     }
     params = {"q": query, "limit": limit}
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params)
+    client = get_http_client()
+
+    async def request():
+        start = time.monotonic()
+        response = await client.get(
+            url, headers=headers, params=params, timeout=request_timeout(url))
         response.raise_for_status()
+        browse_latency.record(time.monotonic() - start)
+        return response.json()
+
+    hedge_delay = browse_latency.percentile(EBAY_HEDGE_PERCENTILE) if EBAY_HEDGE_PERCENTILE else None
+    result, hedge_sent = await browse_breaker.call(lambda: hedged(request, hedge_delay))
+    if hedge_sent:
+        browse_hedges["sent"] += 1
+    return result
+
+
+def search_stats():
+    return {
+        "breaker": browse_breaker.stats(),
+        "hedgesSent": browse_hedges["sent"],
+        "p50Latency": browse_latency.percentile(50),
+        "p95Latency": browse_latency.percentile(95),
+    }
+
+
+async def search_comparables(keywords, limit: int = 10):
+    """
+    Searches eBay for comparables of Gemini's searchKeywords through the
+    comparables cache. Returns a list of compact Comparable records.
+    """
+    query = normalize_query(keywords)
+
+    async def fetch(q):
+        async with ebay_slots:
+            payload = await search_items(q, limit=limit)
+        return list(iter_comparables(payload))
 
-        print(response.json())
-        return response.json()
\ No newline at end of file
+    return await comparables_cache.get(query, fetch)
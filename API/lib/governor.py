@@ -0,0 +1,166 @@
+import asyncio
+import os
+import random
+import time
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    THROTTLE_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+except ImportError:
+    THROTTLE_ERRORS = ()
+
+MODEL_CONCURRENCY = int(os.environ.get("MODEL_CONCURRENCY", 8))
+# Requests per second across all model calls; 0 disables the token bucket
+MODEL_RATE_LIMIT = float(os.environ.get("MODEL_RATE_LIMIT", 0))
+MODEL_RATE_BURST = int(os.environ.get("MODEL_RATE_BURST", 10))
+MODEL_QUEUE_TIMEOUT = float(os.environ.get("MODEL_QUEUE_TIMEOUT", 30))
+MODEL_MAX_RETRIES = int(os.environ.get("MODEL_MAX_RETRIES", 3))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+
+class GovernorTimeout(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """
+        Takes a token and returns 0, or returns the seconds until one is available.
+        """
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def is_throttle(e: Exception) -> bool:
+    return isinstance(e, THROTTLE_ERRORS) or getattr(e, "code", None) in (429, 503)
+
+
+def retry_after_hint(e: Exception) -> float | None:
+    """
+    Seconds the server asked us to wait, if the error carries a Retry-After header.
+    """
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ModelGovernor:
+    """
+    Shared admission control for Gemini calls. A token bucket caps the request
+    rate, and an AIMD limit caps concurrency: it halves on every throttle error
+    (429 / quota / 503) and grows back by about one slot per limit's worth of
+    successes. Callers queue until admitted or until their deadline passes.
+    Failed calls are retried with exponential backoff and full jitter, and
+    Retry-After hints are honoured.
+    """
+
+    def __init__(self, max_concurrency: int = MODEL_CONCURRENCY, rate: float = MODEL_RATE_LIMIT,
+                 burst: int = MODEL_RATE_BURST, queue_timeout: float = MODEL_QUEUE_TIMEOUT,
+                 max_retries: int = MODEL_MAX_RETRIES):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self._changed = asyncio.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.throttle_events = 0
+        self.retries = 0
+        self.queue_timeouts = 0
+
+    async def _acquire(self, deadline: float):
+        self.queued += 1
+        try:
+            async with self._changed:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self.in_flight < int(self.limit):
+                        wait = self.bucket.take(now)
+                        if wait == 0:
+                            self.in_flight += 1
+                            return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.queue_timeouts += 1
+                        raise GovernorTimeout("Timed out waiting for model capacity.")
+                    try:
+                        await asyncio.wait_for(
+                            self._changed.wait(), timeout=min(wait, remaining) if wait else remaining)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self.queued -= 1
+
+    async def _release(self, throttled: bool):
+        async with self._changed:
+            self.in_flight -= 1
+            if throttled:
+                self.throttle_events += 1
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._changed.notify_all()
+
+    async def call(self, make_call, retries: int | None = None, deadline: float | None = None):
+        """
+        Runs `await make_call()` under the governor, retrying failures. Raises the
+        last error once retries are exhausted, or GovernorTimeout if the call
+        could not be admitted before the deadline.
+        """
+        retries = self.max_retries if retries is None else retries
+        if deadline is None:
+            deadline = time.monotonic() + self.queue_timeout
+
+        for attempt in range(retries):
+            await self._acquire(deadline)
+            throttled = False
+            try:
+                return await make_call()
+            except Exception as e:
+                throttled = is_throttle(e)
+                print(f"Model call failed (attempt {attempt + 1}/{retries}): {e}")
+                if attempt == retries - 1:
+                    raise
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                hint = retry_after_hint(e)
+                if hint is not None:
+                    delay = max(delay, hint)
+            finally:
+                await self._release(throttled)
+            self.retries += 1
+            if time.monotonic() + delay > deadline:
+                raise GovernorTimeout("Model retries would exceed the request deadline.")
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            "inFlight": self.in_flight,
+            "queueDepth": self.queued,
+            "concurrencyLimit": round(self.limit, 2),
+            "maxConcurrency": self.max_concurrency,
+            "throttleEvents": self.throttle_events,
+            "retries": self.retries,
+            "queueTimeouts": self.queue_timeouts,
+        }
+
+
+model_governor = ModelGovernor()
@@ -0,0 +1,73 @@
+import os
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30))
+
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Per-host overrides, looked up by request_timeout()
+HOST_TIMEOUTS = {
+    "api.sandbox.ebay.com": httpx.Timeout(float(os.environ.get("EBAY_TIMEOUT", 10)), connect=3.0),
+    "api.ebay.com": httpx.Timeout(float(os.environ.get("EBAY_TIMEOUT", 10)), connect=3.0),
+}
+
+_client = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=DEFAULT_TIMEOUT,
+    )
+
+
+async def start_http_client():
+    """
+    Creates the shared client. Called from the FastAPI lifespan on startup.
+    """
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+async def close_http_client():
+    """
+    Closes the shared client and its pooled connections on shutdown.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared, keep-alive AsyncClient, creating it on first use
+    (for scripts that run outside the FastAPI lifespan).
+    """
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+def request_timeout(url: str) -> httpx.Timeout:
+    return HOST_TIMEOUTS.get(urlsplit(url).hostname, DEFAULT_TIMEOUT)
@@ -0,0 +1,107 @@
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from lib.phash import dhash_image
+
+try:
+    # Optional: lets Pillow decode the HEIC photos iPhones upload by default
+    import pillow_heif
+    pillow_heif.register_heif_opener()
+except ImportError:
+    pass
+
+# Longest-side limits per consumer. Gemini downsamples large images anyway, and
+# eBay Picture Services recommends 1600px (minimum 500px) on the longest side.
+MODEL_MAX_DIM = int(os.environ.get("MODEL_MAX_DIM", 1024))
+EBAY_MAX_DIM = int(os.environ.get("EBAY_MAX_DIM", 1600))
+JPEG_QUALITY = int(os.environ.get("JPEG_QUALITY", 85))
+IMAGE_PREP_WORKERS = int(os.environ.get("IMAGE_PREP_WORKERS", os.cpu_count() or 1))
+
+TARGETS = {
+    "model": MODEL_MAX_DIM,
+    "ebay": EBAY_MAX_DIM,
+}
+
+_executor = None
+
+
+class PreparedImage:
+    """
+    Re-encoded JPEG variants of one upload plus its perceptual hash.
+    """
+
+    def __init__(self, variants: dict, image_hash: int | None):
+        self.variants = variants
+        self.image_hash = image_hash
+        self.mime_type = "image/jpeg"
+
+
+def preprocess_image(image_data: bytes | str, targets=tuple(TARGETS), with_hash: bool = True):
+    """
+    Decodes the upload once, applies the EXIF orientation, and re-encodes one
+    EXIF-free JPEG per target, resized to that target's max dimension.
+    Runs inside the process pool, so it only takes and returns picklable values.
+    image_data may be a file path, which the worker reads itself.
+    """
+    img = Image.open(image_data if isinstance(image_data, str) else io.BytesIO(image_data))
+    largest = max(TARGETS[target] for target in targets)
+    # For JPEGs this decodes straight at a reduced scale instead of full resolution
+    img.draft("RGB", (largest, largest))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    variants = {}
+    for target in targets:
+        max_dim = TARGETS[target]
+        resized = img.copy()
+        resized.thumbnail((max_dim, max_dim), Image.LANCZOS)
+        out = io.BytesIO()
+        # No exif= argument, so metadata (GPS etc.) is dropped
+        resized.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        variants[target] = out.getvalue()
+
+    image_hash = dhash_image(img) if with_hash else None
+    return variants, image_hash
+
+
+def _mp_context():
+    # By the time the pool starts, the process runs to_thread workers and the
+    # journal flusher, and forking a threaded process can leave a child stuck
+    # on a lock one of those threads held. forkserver forks workers from a
+    # clean single-threaded server instead; spawn where it isn't available.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_PREP_WORKERS, mp_context=_mp_context())
+    return _executor
+
+
+async def prepare_image(image_data: bytes | str, targets=tuple(TARGETS), with_hash: bool = True) -> PreparedImage:
+    """
+    Runs preprocess_image in the process pool so decoding never blocks the event loop.
+    Pass a file path for large uploads so the bytes are not pickled to the worker.
+    """
+    loop = asyncio.get_running_loop()
+    variants, image_hash = await loop.run_in_executor(
+        _get_executor(), preprocess_image, image_data, tuple(targets), with_hash)
+    return PreparedImage(variants, image_hash)
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,287 @@
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing, contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from lib.http_client import request_timeout
+
+JOBS_DB = os.environ.get("JOBS_DB", "jobs.db")
+JOBS_WORKERS = int(os.environ.get("JOBS_WORKERS", 4))
+JOBS_MAX_QUEUE_DEPTH = int(os.environ.get("JOBS_MAX_QUEUE_DEPTH", 200))
+JOBS_TIMEOUT = float(os.environ.get("JOBS_TIMEOUT", 120))
+JOBS_RETENTION = float(os.environ.get("JOBS_RETENTION", 24 * 60 * 60))
+JOBS_POLL_INTERVAL = 1.0
+# Comma-separated hosts webhooks may be sent to (".example.com" also allows
+# subdomains). Empty allows any public https host.
+JOBS_WEBHOOK_ALLOWED_HOSTS = [
+    host.strip().lower() for host in os.environ.get("JOBS_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class InvalidWebhook(ValueError):
+    pass
+
+
+async def check_webhook_url(url: str, allowed_hosts: list = JOBS_WEBHOOK_ALLOWED_HOSTS) -> str:
+    """
+    Raises InvalidWebhook unless url is https, its host is allowed, and every
+    address it resolves to is public (no loopback, private, link-local or
+    metadata addresses), so clients can't make the server call internal services.
+    Returns the first checked address, to connect to.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme != "https" or not host:
+        raise InvalidWebhook("webhook_url must be an https URL.")
+    if allowed_hosts and not any(
+            host == allowed or (allowed.startswith(".") and host.endswith(allowed)) for allowed in allowed_hosts):
+        raise InvalidWebhook(f"webhook_url host {host} is not allowed.")
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(
+            host, parts.port or 443, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise InvalidWebhook(f"webhook_url host {host} could not be resolved.")
+    checked = []
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if not address.is_global:
+            raise InvalidWebhook(f"webhook_url host {host} resolves to a non-public address.")
+        checked.append(str(address))
+    return checked[0]
+
+
+async def post_webhook(url: str, address: str, payload):
+    """
+    POSTs payload to url over a connection to address, the IP check_webhook_url
+    approved, rather than resolving the host again: a host that re-resolves to
+    an internal address (DNS rebinding) can't redirect the delivery. The Host
+    header and TLS SNI still carry the real host name, and the certificate is
+    verified against it. Redirects are not followed.
+    """
+    target = httpx.URL(url)
+    async with httpx.AsyncClient(timeout=request_timeout(url)) as client:
+        response = await client.post(
+            target.copy_with(host=address), json=payload,
+            headers={"Host": target.netloc.decode("ascii")},
+            extensions={"sni_hostname": target.host})
+        response.raise_for_status()
+
+
+class JobQueue:
+    """
+    Persistent local queue for /analyze-image/jobs, backed by SQLite.
+    A bounded pool of asyncio workers drains it; jobs left running by a crash
+    are re-queued on startup once their timeout has passed. Finished jobs are
+    kept for JOBS_RETENTION seconds.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB, workers: int = JOBS_WORKERS,
+                 max_depth: int = JOBS_MAX_QUEUE_DEPTH, timeout: float = JOBS_TIMEOUT):
+        self.db_path = db_path
+        self.num_workers = workers
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self._workers = []
+        self._wakeup = None
+        self._handler = None
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            yield conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    mode TEXT,
+                    content_type TEXT,
+                    image BLOB,
+                    webhook_url TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    # --- Blocking SQLite operations, run via asyncio.to_thread ---
+
+    def _depth(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    def _insert(self, job_id, image_data, content_type, mode, webhook_url):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if depth >= self.max_depth:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO jobs (id, status, mode, content_type, image, webhook_url, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, mode, content_type, image_data, webhook_url, now, now))
+            conn.execute("COMMIT")
+        return True
+
+    def _claim(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ("
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1) "
+                "RETURNING id, mode, content_type, image, webhook_url",
+                (RUNNING, time.time(), QUEUED)).fetchone()
+
+    def _finish(self, job_id, status, result=None, error=None):
+        now = time.time()
+        with self._connect() as conn:
+            # The image is only needed while the job runs
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, image = NULL, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, job_id))
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?",
+                (DONE, FAILED, TIMED_OUT, now - JOBS_RETENTION))
+
+    def _requeue_stale(self):
+        # Jobs still "running" past their timeout were orphaned by a crash or restart
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, RUNNING, time.time() - self.timeout))
+
+    def _get(self, job_id):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT id, status, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)).fetchone()
+
+    # --- Async API ---
+
+    async def submit(self, image_data: bytes, content_type: str, mode: str | None = None,
+                     webhook_url: str | None = None) -> str:
+        """
+        Persists a job and returns its id. Raises QueueFull when the queue is at max_depth.
+        """
+        job_id = uuid.uuid4().hex
+        accepted = await asyncio.to_thread(
+            self._insert, job_id, image_data, content_type, mode, webhook_url)
+        if not accepted:
+            self.rejected += 1
+            raise QueueFull(f"Analysis queue is full ({self.max_depth} jobs waiting).")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str):
+        row = await asyncio.to_thread(self._get, job_id)
+        if row is None:
+            return None
+        return {
+            "jobId": row["id"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"],
+        }
+
+    async def _deliver_webhook(self, webhook_url: str, payload):
+        try:
+            # Checked again in case the host now resolves somewhere else, then
+            # delivered to exactly the address that passed the check
+            address = await check_webhook_url(webhook_url)
+            await post_webhook(webhook_url, address, payload)
+        except Exception as e:
+            print(f"Webhook delivery to {webhook_url} failed: {e}")
+
+    async def _run_job(self, row):
+        job_id = row["id"]
+        result = error = None
+        try:
+            result = await asyncio.wait_for(
+                self._handler(row["image"], row["content_type"], row["mode"]), timeout=self.timeout)
+            status = DONE
+            self.completed += 1
+        except asyncio.TimeoutError:
+            status, error = TIMED_OUT, f"Analysis did not finish within {self.timeout:.0f} seconds."
+            self.timed_out += 1
+        except Exception as e:
+            status, error = FAILED, str(getattr(e, "detail", e))
+            self.failed += 1
+            print(f"Analysis job {job_id} failed: {error}")
+
+        await asyncio.to_thread(self._finish, job_id, status, result, error)
+        if row["webhook_url"]:
+            await self._deliver_webhook(
+                row["webhook_url"], {"jobId": job_id, "status": status, "result": result, "error": error})
+
+    async def _worker(self):
+        while True:
+            row = await asyncio.to_thread(self._claim)
+            if row is None:
+                self._wakeup.clear()
+                try:
+                    # Poll as well, in case another process queued the job
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOBS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run_job(row)
+
+    async def start(self, handler):
+        """
+        Starts the worker pool. handler(image_data, content_type, mode) returns the analysis.
+        """
+        self._handler = handler
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self._init_db)
+        await asyncio.to_thread(self._requeue_stale)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def stats(self):
+        return {
+            "queueDepth": await asyncio.to_thread(self._depth),
+            "maxQueueDepth": self.max_depth,
+            "workers": self.num_workers,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timedOut": self.timed_out,
+            "rejected": self.rejected,
+        }
+
+
+job_queue = JobQueue()
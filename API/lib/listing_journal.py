@@ -0,0 +1,263 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking, so keep to one process per journal
+    fcntl = None
+
+from listing_store import ListingStore, listing_store
+
+# Imported as listing_journal by the scripts run from lib/ (ebay_post.py),
+# so this module must not import anything from lib.
+
+LISTING_JOURNAL = os.environ.get("LISTING_JOURNAL", "listing_journal.log")
+# Fold the journal into the listing store once it holds this many events
+JOURNAL_COMPACT_EVERY = int(os.environ.get("JOURNAL_COMPACT_EVERY", 1000))
+
+
+class JournalError(Exception):
+    pass
+
+
+class ListingJournal:
+    """
+    Append-only, fsync-batched log of listing created/ended events. Writers
+    append a line and wait for a background thread that fsyncs everything
+    pending at once (group commit), so the hot path never rewrites a file.
+    Every JOURNAL_COMPACT_EVERY events the tail is folded into the listing
+    store, which acts as the snapshot, and the journal is truncated. On open
+    the active set is rebuilt from the store plus any journal tail left by a
+    crash; a torn last line is discarded.
+
+    The process that opens the journal first holds an exclusive lock on it
+    until it closes. Other processes find it locked and write straight to the
+    listing store instead (direct mode); they see the owner's events once
+    they are compacted.
+
+    If writing or fsyncing the journal fails, the flusher stops and every
+    waiting and later write raises JournalError. A failed compaction is only
+    logged: the events are still in the journal and are folded in next time.
+    """
+
+    def __init__(self, path: str = LISTING_JOURNAL, store: ListingStore = listing_store,
+                 compact_every: int = JOURNAL_COMPACT_EVERY):
+        self.path = path
+        self.store = store
+        self.compact_every = compact_every
+        self.active = {}
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()
+        self._pending = []
+        self._unapplied = []
+        self._seq = 0
+        self._durable_seq = 0
+        self._file = None
+        self._thread = None
+        self._opened = False
+        self._closed = False
+        self._error = None
+        self.direct = False
+        self.flushes = 0
+        self.compactions = 0
+
+    def _lock_file(self) -> bool:
+        self._file = open(self.path, "ab")
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            self._file.close()
+            self._file = None
+            return False
+
+    def _load_active(self):
+        cursor = None
+        while True:
+            page, cursor = self.store.page(limit=500, cursor=cursor)
+            self.active.update((listing["item_id"], listing) for listing in page)
+            if cursor is None:
+                break
+
+    def _replay(self):
+        # Only the lock holder may read and truncate the journal
+        if not self._lock_file():
+            print(f"{self.path} is in use by another process; writing to the listing store directly")
+            self.direct = True
+            return
+        applied_seq = self.store.journal_seq()
+        events = []
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as file:
+                for line in file:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break  # torn write from a crash; everything after it is lost
+                    if event["seq"] > applied_seq:
+                        events.append(event)
+        if events:
+            print(f"Replaying {len(events)} listing journal events")
+            applied_seq = events[-1]["seq"]
+            self.store.apply_events(events, applied_seq)
+
+        # The store now holds everything, so start a fresh journal
+        self._file.truncate(0)
+        os.fsync(self._file.fileno())
+        self._seq = self._durable_seq = applied_seq
+        self._load_active()
+
+    def _ensure_open(self):
+        if self._opened:
+            return
+        with self._io_lock:
+            if not self._opened:
+                self._replay()
+                if not self.direct:
+                    self._thread = threading.Thread(target=self._flush_loop, name="listing-journal", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+                self._opened = True
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._flushed.wait()
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+            with self._io_lock:
+                try:
+                    self._file.write(b"".join(json.dumps(event).encode() + b"\n" for event in batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except Exception as e:
+                    print(f"Listing journal write failed, no further events can be recorded: {e}")
+                    with self._lock:
+                        self._error = e
+                        self._flushed.notify_all()
+                    return
+                self._unapplied.extend(batch)
+                self.flushes += 1
+                if len(self._unapplied) >= self.compact_every:
+                    try:
+                        self._compact()
+                    except Exception as e:
+                        print(f"Listing journal compaction failed, will retry: {e}")
+            with self._lock:
+                self._durable_seq = batch[-1]["seq"]
+                self._flushed.notify_all()
+
+    def _compact(self):
+        # Caller holds _io_lock, so nothing is written to the file meanwhile
+        if not self._unapplied:
+            return
+        self.store.apply_events(self._unapplied, self._unapplied[-1]["seq"])
+        self._file.truncate(0)
+        os.fsync(self._file.fileno())
+        self._unapplied = []
+        self.compactions += 1
+
+    def _check_error(self):
+        # Caller holds _lock
+        if self._error is not None:
+            raise JournalError(f"Listing journal write failed: {self._error}") from self._error
+
+    def _append(self, event: dict, durable: bool) -> bool:
+        self._ensure_open()
+        if self.direct:
+            if event["op"] == "created":
+                self.store.add(event["item_id"], event["title"], event["ts"])
+                return True
+            return self.store.end(event["item_id"], event["ts"])
+        with self._lock:
+            self._check_error()
+            item_id = event["item_id"]
+            if event["op"] == "created":
+                self.active[item_id] = {"item_id": item_id, "title": event["title"], "status": "active",
+                                        "created_at": event["ts"], "ended_at": None}
+            elif self.active.pop(item_id, None) is None:
+                return False
+            self._seq += 1
+            event["seq"] = self._seq
+            self._pending.append(event)
+            self._flushed.notify_all()
+            if durable:
+                while self._durable_seq < event["seq"]:
+                    self._check_error()
+                    self._flushed.wait()
+        return True
+
+    def created(self, item_id: str, title: str = "", durable: bool = True):
+        self._append({"op": "created", "item_id": item_id, "title": title, "ts": time.time()}, durable)
+
+    def ended(self, item_id: str, durable: bool = True) -> bool:
+        """
+        Records that a listing ended. Returns False if it was not active.
+        """
+        return self._append({"op": "ended", "item_id": item_id, "ts": time.time()}, durable)
+
+    def active_listings(self) -> list:
+        self._ensure_open()
+        if self.direct:
+            self.active = {}
+            self._load_active()
+        with self._lock:
+            listings = list(self.active.values())
+        return sorted(listings, key=lambda listing: listing["created_at"])
+
+    def compact(self):
+        """
+        Flushes pending events and folds the journal into the listing store now.
+        Returns at once if every event is already in the store.
+        """
+        self._ensure_open()
+        if self.direct:
+            return
+        with self._lock:
+            if self._durable_seq == self._seq and not self._unapplied:
+                return
+            while self._durable_seq < self._seq:
+                self._check_error()
+                self._flushed.wait()
+        with self._io_lock:
+            self._compact()
+
+    def close(self):
+        if self._thread is None:
+            return
+        with self._lock:
+            self._closed = True
+            self._flushed.notify_all()
+        self._thread.join()
+        with self._io_lock:
+            try:
+                self._compact()
+            finally:
+                # Closing the file releases the lock
+                self._file.close()
+        self._thread = None
+        self._opened = False
+        self._closed = False
+        self._error = None
+
+    def stats(self):
+        return {
+            "active": len(self.active),
+            "seq": self._seq,
+            "direct": self.direct,
+            "failed": self._error is not None,
+            "unapplied": len(self._unapplied),
+            "flushes": self.flushes,
+            "compactions": self.compactions,
+        }
+
+
+listing_journal = ListingJournal()
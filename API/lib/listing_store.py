@@ -0,0 +1,168 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+# Imported both as lib.listing_store and as listing_store (scripts run from
+# lib/), so this module must not import anything from lib.
+
+LISTINGS_DB = os.environ.get("LISTINGS_DB", "listings.db")
+LISTINGS_CSV = os.environ.get("LISTINGS_CSV", "active_listings.csv")
+
+ACTIVE = "active"
+ENDED = "ended"
+
+
+class ListingStore:
+    """
+    Ledger of the listings we created on eBay, backed by SQLite in WAL mode.
+    item_id is unique and status is indexed, so adds, ends and lookups are
+    O(log n) and active listings can be paged with a cursor.
+    Writes are single statements, so several processes can share the file.
+    The old active_listings.csv is imported once, the first time the store
+    is opened.
+    """
+
+    def __init__(self, db_path: str = LISTINGS_DB, csv_path: str | None = LISTINGS_CSV):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None)) as conn:
+            conn.row_factory = sqlite3.Row
+            # Safe with WAL: a power loss can drop the last commits but never corrupts the file
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._initialized:
+                with self._init_lock:
+                    if not self._initialized:
+                        self._init_db(conn)
+                        self._initialized = True
+            yield conn
+
+    def _init_db(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                id INTEGER PRIMARY KEY,
+                item_id TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                ended_at REAL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS listings_status ON listings (status)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._migrate_csv(conn)
+
+    def _migrate_csv(self, conn):
+        if not self.csv_path or not os.path.exists(self.csv_path):
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+                conn.execute("ROLLBACK")
+                return
+            with open(self.csv_path, "r", newline="", encoding="utf-8") as file:
+                rows = [row for row in csv.DictReader(file) if row.get("item_id")]
+            conn.executemany(
+                "INSERT OR IGNORE INTO listings (item_id, title, status, created_at) VALUES (?, ?, ?, ?)",
+                [(row["item_id"], row.get("title") or "", ACTIVE, _parse_timestamp(row.get("created_at")))
+                 for row in rows])
+            conn.execute("INSERT INTO meta (key, value) VALUES ('csv_migrated', ?)", (str(time.time()),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if rows:
+            print(f"Migrated {len(rows)} listings from {self.csv_path} to {self.db_path}")
+
+    def add(self, item_id: str, title: str = "", created_at: float | None = None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO listings (item_id, title, status, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (item_id) DO UPDATE SET title = excluded.title, status = excluded.status, "
+                "created_at = excluded.created_at, ended_at = NULL",
+                (item_id, title, ACTIVE, created_at or time.time()))
+
+    def end(self, item_id: str, ended_at: float | None = None) -> bool:
+        """
+        Marks a listing as ended. Returns False if it was not active.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE listings SET status = ?, ended_at = ? WHERE item_id = ? AND status = ?",
+                (ENDED, ended_at or time.time(), item_id, ACTIVE))
+            return cursor.rowcount > 0
+
+    def get(self, item_id: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT item_id, title, status, created_at, ended_at FROM listings WHERE item_id = ?",
+                (item_id,)).fetchone()
+        return dict(row) if row else None
+
+    def page(self, status: str = ACTIVE, limit: int = 100, cursor: int | None = None):
+        """
+        Returns (listings, next_cursor) in creation order. Pass next_cursor back
+        to get the following page; it is None on the last page.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, item_id, title, status, created_at, ended_at FROM listings "
+                "WHERE status = ? AND id > ? ORDER BY id LIMIT ?",
+                (status, cursor or 0, limit)).fetchall()
+        next_cursor = rows[-1]["id"] if len(rows) == limit else None
+        return [{key: row[key] for key in row.keys() if key != "id"} for row in rows], next_cursor
+
+    def journal_seq(self) -> int:
+        """
+        Sequence number of the last listing journal event applied to the store.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'journal_seq'").fetchone()
+        return int(row["value"]) if row else 0
+
+    def apply_events(self, events: list, seq: int):
+        """
+        Applies journal events ({"op": "created" | "ended", "item_id", "title",
+        "ts"}) in one transaction and records seq as applied.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for event in events:
+                    if event["op"] == "created":
+                        conn.execute(
+                            "INSERT INTO listings (item_id, title, status, created_at) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT (item_id) DO UPDATE SET title = excluded.title, "
+                            "status = excluded.status, created_at = excluded.created_at, ended_at = NULL",
+                            (event["item_id"], event.get("title", ""), ACTIVE, event["ts"]))
+                    else:
+                        conn.execute(
+                            "UPDATE listings SET status = ?, ended_at = ? WHERE item_id = ? AND status = ?",
+                            (ENDED, event["ts"], event["item_id"], ACTIVE))
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('journal_seq', ?)", (str(seq),))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def count(self, status: str = ACTIVE) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM listings WHERE status = ?", (status,)).fetchone()[0]
+
+
+def _parse_timestamp(value: str | None) -> float:
+    try:
+        return time.mktime(time.strptime(value, "%Y-%m-%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        return time.time()
+
+
+listing_store = ListingStore()
@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+
+# "vertex" (Gemini on Vertex AI) or "stub" (deterministic local fake, for load tests)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "vertex")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+
+# Stub backend: median latency per call, its distribution ("fixed", "uniform"
+# or "lognormal") and spread, and the share of calls that fail
+STUB_MODEL_LATENCY = float(os.environ.get("STUB_MODEL_LATENCY", 1.0))
+STUB_MODEL_LATENCY_DIST = os.environ.get("STUB_MODEL_LATENCY_DIST", "lognormal")
+STUB_MODEL_LATENCY_SPREAD = float(os.environ.get("STUB_MODEL_LATENCY_SPREAD", 0.4))
+STUB_MODEL_THROTTLE_RATE = float(os.environ.get("STUB_MODEL_THROTTLE_RATE", 0))
+STUB_MODEL_ERROR_RATE = float(os.environ.get("STUB_MODEL_ERROR_RATE", 0))
+STUB_MODEL_BAD_JSON_RATE = float(os.environ.get("STUB_MODEL_BAD_JSON_RATE", 0))
+STUB_MODEL_SEED = int(os.environ.get("STUB_MODEL_SEED", 0))
+STUB_MAX_TRACKED_PROMPTS = 100000
+
+
+class ImagePart:
+    """
+    Backend-neutral image input; each backend converts it to its own type.
+    """
+
+    __slots__ = ("data", "mime_type")
+
+    def __init__(self, data: bytes, mime_type: str):
+        self.data = data
+        self.mime_type = mime_type
+
+
+class FunctionCall:
+    __slots__ = ("name", "args")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+
+class FunctionResponse:
+    __slots__ = ("name", "response")
+
+    def __init__(self, name: str, response: dict):
+        self.name = name
+        self.response = response
+
+
+class ModelTurn:
+    """
+    One reply in a tool session: function calls to answer, or the final text.
+    """
+
+    def __init__(self, text: str | None, function_calls: list):
+        self.text = text
+        self.function_calls = function_calls
+
+
+class VertexBackend:
+    """
+    Gemini on Vertex AI. Imports and initializes the SDK when constructed,
+    which lib.providers defers until first use.
+    """
+
+    name = "vertex"
+
+    def __init__(self, model_name: str = GEMINI_MODEL, project: str | None = None):
+        import vertexai
+        from vertexai.generative_models import GenerationConfig, GenerativeModel
+
+        vertexai.init(project=project or os.environ["PROJECT_ID"])
+        self._model = GenerativeModel(model_name)
+        self._json_config = GenerationConfig(response_mime_type="application/json")
+
+    def _contents(self, contents: list) -> list:
+        from vertexai.generative_models import Part
+
+        converted = []
+        for content in contents:
+            if isinstance(content, ImagePart):
+                content = Part.from_data(data=content.data, mime_type=content.mime_type)
+            elif isinstance(content, FunctionResponse):
+                content = Part.from_function_response(name=content.name, response=content.response)
+            converted.append(content)
+        return converted
+
+    async def generate_json(self, contents: list) -> str:
+        response = await self._model.generate_content_async(
+            self._contents(contents), stream=False, generation_config=self._json_config)
+        return response.text
+
+    def start_tool_session(self, declarations: list):
+        from vertexai.generative_models import FunctionDeclaration, Tool
+
+        tools = [Tool(function_declarations=[FunctionDeclaration(**declaration) for declaration in declarations])]
+        return VertexToolSession(self, self._model.start_chat(response_validation=False), tools)
+
+
+class VertexToolSession:
+    def __init__(self, backend: VertexBackend, chat, tools: list):
+        self._backend = backend
+        self._chat = chat
+        self._tools = tools
+
+    async def send(self, contents: list) -> ModelTurn:
+        response = await self._chat.send_message_async(self._backend._contents(contents), tools=self._tools)
+        calls = [FunctionCall(call.name, dict(call.args)) for call in response.candidates[0].function_calls]
+        return ModelTurn(None if calls else response.text, calls)
+
+
+class StubModelError(Exception):
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+# (item, brand, keywords, typical used price) the stub picks from by image hash
+STUB_CATALOG = (
+    ("Sony WH-1000XM4 Wireless Headphones", "Sony", ["sony", "wh-1000xm4", "headphones"], 140.0),
+    ("Apple iPhone 12 128GB", "Apple", ["iphone 12", "128gb", "unlocked"], 260.0),
+    ("Nintendo Switch OLED Console", "Nintendo", ["nintendo switch", "oled", "console"], 240.0),
+    ("Canon EF 50mm f/1.8 STM Lens", "Canon", ["canon", "ef 50mm", "f/1.8 stm"], 95.0),
+    ("LEGO Star Wars Millennium Falcon 75257", "LEGO", ["lego", "75257", "millennium falcon"], 120.0),
+    ("Patagonia Better Sweater Fleece Jacket", "Patagonia", ["patagonia", "better sweater", "fleece"], 65.0),
+    ("KitchenAid Artisan Stand Mixer", "KitchenAid", ["kitchenaid", "artisan", "stand mixer"], 210.0),
+    ("Apple Watch Series 7 45mm", "Apple", ["apple watch", "series 7", "45mm"], 180.0),
+)
+STUB_CONDITIONS = ("New", "Used - Like New", "Used - Good", "Used - Good", "For parts")
+STUB_QUALITIES = ("Excellent", "Good", "Good", "Fair")
+# Added to the keywords so different photos mostly search for different things
+STUB_VARIANTS = ("black", "white", "silver", "blue", "red", "gray", "gold", "green",
+                 "bundle", "boxed", "refurbished", "sealed", "damaged", "vintage", "limited edition", "lot")
+
+
+class StubBackend:
+    """
+    Deterministic local stand-in for Gemini. The answer depends only on the
+    image bytes; latency and failures are drawn from a RNG seeded with
+    STUB_MODEL_SEED, the image, the prompt and how many times that prompt was
+    sent, so a run is reproducible regardless of scheduling and a retry can
+    succeed where the first attempt failed. Throttles raise with code 429 so
+    the model governor backs off as it would for Vertex AI.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: float = STUB_MODEL_LATENCY, latency_dist: str = STUB_MODEL_LATENCY_DIST,
+                 latency_spread: float = STUB_MODEL_LATENCY_SPREAD, throttle_rate: float = STUB_MODEL_THROTTLE_RATE,
+                 error_rate: float = STUB_MODEL_ERROR_RATE, bad_json_rate: float = STUB_MODEL_BAD_JSON_RATE,
+                 seed: int = STUB_MODEL_SEED):
+        if latency_dist not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown STUB_MODEL_LATENCY_DIST {latency_dist!r}")
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.latency_spread = latency_spread
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.bad_json_rate = bad_json_rate
+        self.seed = seed
+        self._attempts = {}
+        self.calls = 0
+        self.failures = 0
+
+    def _rng(self, contents: list) -> random.Random:
+        hasher = hashlib.sha256(str(self.seed).encode())
+        for content in contents:
+            if isinstance(content, ImagePart):
+                hasher.update(content.data)
+            elif isinstance(content, FunctionResponse):
+                hasher.update(json.dumps(content.response, sort_keys=True).encode())
+            else:
+                hasher.update(str(content).encode())
+        key = hasher.digest()
+        if len(self._attempts) > STUB_MAX_TRACKED_PROMPTS:
+            self._attempts.clear()
+        attempt = self._attempts.get(key, 0)
+        self._attempts[key] = attempt + 1
+        return random.Random(key + attempt.to_bytes(4, "big"))
+
+    def _delay(self, rng: random.Random) -> float:
+        if self.latency_dist == "fixed":
+            return self.latency
+        if self.latency_dist == "uniform":
+            return max(rng.uniform(self.latency * (1 - self.latency_spread), self.latency * (1 + self.latency_spread)), 0)
+        return rng.lognormvariate(math.log(self.latency), self.latency_spread) if self.latency > 0 else 0
+
+    async def _call(self, contents: list) -> random.Random:
+        """
+        Sleeps for the drawn latency and raises the drawn failure, if any.
+        """
+        rng = self._rng(contents)
+        self.calls += 1
+        await asyncio.sleep(self._delay(rng))
+        roll = rng.random()
+        if roll < self.throttle_rate:
+            self.failures += 1
+            raise StubModelError("Stub model: resource exhausted", 429)
+        if roll < self.throttle_rate + self.error_rate:
+            self.failures += 1
+            raise StubModelError("Stub model: internal error", 500)
+        return rng
+
+    def _item(self, contents: list) -> dict:
+        image = next((content for content in contents if isinstance(content, ImagePart)), None)
+        digest = hashlib.sha256(image.data if image else b"").digest()
+        item, brand, keywords, price = STUB_CATALOG[digest[0] % len(STUB_CATALOG)]
+        return {
+            "item": item,
+            "brand": brand,
+            "description": f"A pre-owned {item}.",
+            "imageQuality": STUB_QUALITIES[digest[1] % len(STUB_QUALITIES)],
+            "searchKeywords": keywords + [STUB_VARIANTS[digest[4] % len(STUB_VARIANTS)]],
+            "condition": STUB_CONDITIONS[digest[2] % len(STUB_CONDITIONS)],
+            "_price": price * (0.8 + digest[3] / 640),
+        }
+
+    @staticmethod
+    def _estimated_price(item: dict) -> dict:
+        suggested = round(item["_price"], 2)
+        return {"min": round(suggested * 0.85, 2), "max": round(suggested * 1.15, 2), "suggested": suggested}
+
+    async def generate_json(self, contents: list) -> str:
+        rng = await self._call(contents)
+        if rng.random() < self.bad_json_rate:
+            return '{"item": '
+        item = self._item(contents)
+        prompt = next((content for content in reversed(contents) if isinstance(content, str)), "")
+        if "estimatedPrice" in prompt:
+            # Price stage: anchor on the median price of the comparables table, if any
+            prices = sorted(_table_prices(prompt))
+            if prices:
+                item["_price"] = prices[len(prices) // 2]
+            return json.dumps({"estimatedPrice": self._estimated_price(item)})
+        item.pop("_price")
+        return json.dumps(item)
+
+    def start_tool_session(self, declarations: list):
+        return StubToolSession(self, declarations[0]["name"] if declarations else None)
+
+
+class StubToolSession:
+    """
+    Asks for the first declared function once with the item's keywords, then
+    answers with the complete analysis.
+    """
+
+    def __init__(self, backend: StubBackend, function_name: str | None):
+        self._backend = backend
+        self._function_name = function_name
+        self._item = None
+
+    async def send(self, contents: list) -> ModelTurn:
+        await self._backend._call(contents)
+        if self._item is None:
+            self._item = self._backend._item(contents)
+            if self._function_name:
+                return ModelTurn(None, [FunctionCall(self._function_name, {"searchKeywords": self._item["searchKeywords"]})])
+        result = {key: value for key, value in self._item.items() if key != "_price"}
+        result["estimatedPrice"] = StubBackend._estimated_price(self._item)
+        return ModelTurn(json.dumps(result), [])
+
+
+def _table_prices(prompt: str):
+    # Rows of format_comparables_table(): title|price|currency|condition|shipping|buying
+    for line in prompt.splitlines():
+        cells = line.strip().split("|")
+        if len(cells) == 6:
+            try:
+                yield float(cells[1])
+            except ValueError:
+                pass
+
+
+def create_model_backend(name: str = MODEL_BACKEND):
+    if name == "vertex":
+        return VertexBackend()
+    if name == "stub":
+        return StubBackend()
+    raise ValueError(f"Unknown MODEL_BACKEND {name!r}; expected vertex or stub")
@@ -0,0 +1,196 @@
+import io
+import os
+from collections import OrderedDict
+
+from PIL import Image
+
+from lib.analysis_cache import ANALYSIS_CACHE_SIZE
+
+PHASH_MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", 6))
+# Hashes kept for near-duplicate lookups; older ones are evicted first. Entries
+# whose analysis has left the cache are useless, so this follows its size.
+PHASH_MAX_ENTRIES = int(os.environ.get("PHASH_MAX_ENTRIES", ANALYSIS_CACHE_SIZE))
+# Images whose downscaled grayscale grid spans fewer levels than this (plain
+# backgrounds, solid colours) get no hash: their bits are all equal or noise
+PHASH_MIN_CONTRAST = int(os.environ.get("PHASH_MIN_CONTRAST", 8))
+HASH_SIZE = 8
+
+
+def dhash(image_data: bytes, hash_size: int = HASH_SIZE) -> int | None:
+    """
+    Computes a difference hash (dHash) of an image as a hash_size**2 bit integer.
+    Re-shot photos of the same item land within a few bits of each other.
+    Returns None for images too flat to tell apart (see PHASH_MIN_CONTRAST).
+    """
+    img = Image.open(io.BytesIO(image_data))
+    # For JPEGs this lets the decoder skip most of the DCT work at full resolution
+    img.draft("L", (hash_size * 8, hash_size * 8))
+    return dhash_image(img, hash_size)
+
+
+def dhash_image(img: Image.Image, hash_size: int = HASH_SIZE) -> int | None:
+    """
+    Same as dhash() for an already decoded image.
+    """
+    img = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(img.getdata())
+    if max(pixels) - min(pixels) < PHASH_MIN_CONTRAST:
+        return None
+    return dhash_from_pixels(pixels, hash_size)
+
+
+def dhash_from_pixels(pixels, hash_size: int = HASH_SIZE) -> int:
+    """
+    Builds the hash from a row-major (hash_size + 1) x hash_size grayscale grid.
+    """
+    value = 0
+    width = hash_size + 1
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing over Hamming distance. Hashes are split into
+    max_distance + 1 disjoint bit chunks, each with its own exact-match table.
+    By the pigeonhole principle any hash within max_distance agrees with the
+    query on at least one chunk, so only those buckets need to be verified.
+    """
+
+    def __init__(self, max_distance: int = PHASH_MAX_DISTANCE, bits: int = HASH_SIZE * HASH_SIZE):
+        self.max_distance = max(max_distance, 0)
+        num_chunks = min(self.max_distance + 1, bits)
+        # (shift, mask) per chunk; widths differ by at most one bit
+        self._chunks = []
+        shift = 0
+        for i in range(num_chunks):
+            width = bits // num_chunks + (1 if i < bits % num_chunks else 0)
+            self._chunks.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables = [{} for _ in self._chunks]
+        self._values = {}
+
+    def add(self, hash_value: int, value):
+        values = self._values.get(hash_value)
+        if values is not None:
+            values.append(value)
+            return
+        self._values[hash_value] = [value]
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((hash_value >> shift) & mask, []).append(hash_value)
+
+    def remove(self, hash_value: int, value):
+        values = self._values.get(hash_value)
+        if values is None or value not in values:
+            return
+        values.remove(value)
+        if values:
+            return
+        del self._values[hash_value]
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            chunk = (hash_value >> shift) & mask
+            bucket = table[chunk]
+            bucket.remove(hash_value)
+            if not bucket:
+                del table[chunk]
+
+    def search(self, hash_value: int):
+        """
+        Returns (distance, value) pairs within max_distance, closest first.
+        """
+        seen = set()
+        matches = []
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            for candidate in table.get((hash_value >> shift) & mask, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = hamming(hash_value, candidate)
+                if distance <= self.max_distance:
+                    matches.extend((distance, value) for value in self._values[candidate])
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def __len__(self):
+        return len(self._values)
+
+
+class NearDuplicateIndex:
+    """
+    Maps perceptual hashes to analysis cache keys so a re-shot photo can reuse
+    an earlier analysis. Holds at most max_entries hashes, evicting the oldest,
+    and drops candidates whose analysis is no longer cached. Hashes within
+    max_distance of all-zero or all-one bits (smooth gradients, near-plain
+    shots) are neither stored nor looked up, since unrelated images share them.
+    """
+
+    def __init__(self, max_distance: int = PHASH_MAX_DISTANCE, max_entries: int = PHASH_MAX_ENTRIES):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.index = MultiIndexHash(max_distance)
+        # cache_key -> hash_value in insertion order, for eviction
+        self._hashes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def _distinctive(self, hash_value: int) -> bool:
+        bits_set = hash_value.bit_count()
+        return self.max_distance < bits_set < HASH_SIZE * HASH_SIZE - self.max_distance
+
+    def add(self, hash_value: int, cache_key: str):
+        if not self._distinctive(hash_value):
+            return
+        if cache_key in self._hashes:
+            self._hashes.move_to_end(cache_key)
+            return
+        self._hashes[cache_key] = hash_value
+        self.index.add(hash_value, cache_key)
+        while len(self._hashes) > self.max_entries:
+            self.remove(next(iter(self._hashes)))
+            self.evictions += 1
+
+    def remove(self, cache_key: str):
+        hash_value = self._hashes.pop(cache_key, None)
+        if hash_value is not None:
+            self.index.remove(hash_value, cache_key)
+
+    async def find(self, hash_value: int, cache):
+        """
+        Returns (cache_key, cached_value) for the nearest stored hash whose
+        analysis is still in the cache, or None.
+        """
+        if not self._distinctive(hash_value):
+            self.skipped += 1
+            return None
+        if self.max_distance >= 0:
+            for _, cache_key in self.index.search(hash_value):
+                value = await cache.get(cache_key, count=False)
+                if value is not None:
+                    self.hits += 1
+                    return cache_key, value
+                self.remove(cache_key)
+        self.misses += 1
+        return None
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hashes": len(self.index),
+            "evictions": self.evictions,
+            "skipped": self.skipped,
+            "maxDistance": self.max_distance,
+        }
+
+
+near_duplicate_index = NearDuplicateIndex(PHASH_MAX_DISTANCE)
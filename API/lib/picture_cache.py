@@ -0,0 +1,99 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+# Imported both as lib.picture_cache (API) and as picture_cache (scripts run
+# from lib/), so this module must not import anything from lib.
+
+PICTURE_CACHE_DB = os.environ.get("PICTURE_CACHE_DB", "picture_cache.db")
+# How long EPS keeps a picture that is not (yet) attached to a listing;
+# ExtensionInDays is added on top of this
+EPS_RETENTION_DAYS = float(os.environ.get("EPS_RETENTION_DAYS", 5))
+# Stop reusing a URL this long before eBay may delete the picture
+EXPIRY_MARGIN = 60 * 60
+
+
+def picture_digest(image_data: bytes) -> str:
+    return hashlib.sha256(image_data).hexdigest()
+
+
+class PictureCache:
+    """
+    Maps the SHA-256 of uploaded picture bytes to the EPS URL eBay returned, so
+    a retried or re-posted listing reuses the hosted picture instead of
+    uploading it again. Entries expire when EPS would drop the picture
+    (EPS_RETENTION_DAYS plus ExtensionInDays). Backed by SQLite, so it is
+    shared by every process on the machine and survives restarts.
+    """
+
+    def __init__(self, db_path: str = PICTURE_CACHE_DB):
+        self.db_path = db_path
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None)) as conn:
+            if not self._initialized:
+                with self._init_lock:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS pictures (
+                            digest TEXT PRIMARY KEY,
+                            url TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            upload_seconds REAL NOT NULL,
+                            expires_at REAL NOT NULL
+                        )""")
+                    self._initialized = True
+            yield conn
+
+    def get(self, digest: str) -> str | None:
+        """
+        Returns the hosted URL for a picture digest, or None if it was never
+        uploaded or may have expired on EPS.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT url, size, upload_seconds FROM pictures WHERE digest = ? AND expires_at > ?",
+                (digest, time.time())).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        url, size, upload_seconds = row
+        self.hits += 1
+        self.bytes_saved += size
+        self.seconds_saved += upload_seconds
+        return url
+
+    def set(self, digest: str, url: str, size: int, upload_seconds: float, extension_days: int | None = None):
+        now = time.time()
+        expires_at = now + (EPS_RETENTION_DAYS + (extension_days or 0)) * 24 * 60 * 60 - EXPIRY_MARGIN
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pictures (digest, url, size, upload_seconds, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (digest, url, size, upload_seconds, expires_at))
+            conn.execute("DELETE FROM pictures WHERE expires_at <= ?", (now,))
+
+    def delete(self, digest: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pictures WHERE digest = ?", (digest,))
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytesSaved": self.bytes_saved,
+            "secondsSaved": round(self.seconds_saved, 2),
+        }
+
+
+picture_cache = PictureCache()
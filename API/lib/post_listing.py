@@ -1,43 +1,40 @@
 import os
-import datetime
-from ebaysdk.exception import ConnectionError
-from ebaysdk.trading import Connection as Trading
+import requests
+from trading import SANDBOX_TOKEN, trading_post
+from trading_xml import build_request, is_success, parse_response, to_xml
 
-def upload_image_to_ebay(api, image_path):
+def upload_image_to_ebay(image_path):
     """
     Uploads an image to eBay Picture Services (EPS) and returns the URL.
     """
     try:
-        files = {'file': ('image', open(image_path, 'rb'))}
-        picture_details = {
-            'PictureName': "MyListingImage" 
-        }
+        with open(image_path, 'rb') as image_file:
+            files = {'file': ('image', image_file.read())}
+        xml_payload = build_request(
+            'UploadSiteHostedPictures', to_xml('PictureName', "MyListingImage"), SANDBOX_TOKEN)
         
         print("Uploading image to eBay...")
-        response = api.execute('UploadSiteHostedPictures', picture_details, files=files)
+        response = trading_post(
+            'UploadSiteHostedPictures', data={'XMLPayload': (None, xml_payload, 'text/xml')}, files=files)
+        response.raise_for_status()
+        parsed = parse_response(response.content, ("FullURL",))
         
-        if response.reply.Ack == 'Success':
-            image_url = response.reply.SiteHostedPictureDetails.FullURL
+        if is_success(parsed):
+            image_url = parsed["FullURL"]
             print(f"Image uploaded successfully. URL: {image_url}")
             return image_url
         else:
             print("Error uploading image:")
-            errors = response.reply.Errors
-            if not isinstance(errors, list):
-                errors = [errors]  # wrap single error in a list
-
-            for error in errors:
-                if error.SeverityCode == 'Error':
-                    print(f"- {error.ShortMessage}: {error.LongMessage}")
+            for error in parsed["errors"]:
+                print(f"- {error}")
 
             return None
 
-    except ConnectionError as e:
+    except requests.exceptions.RequestException as e:
         print(f"Connection Error during image upload: {e}")
-        print(e.response.dict())
         return None
 
-def create_listing(api, image_url, title, descr, price, condition):
+def create_listing(image_url, title, descr, price, condition):
     """
     Creates a new fixed-price listing on eBay.
     """
@@ -88,10 +85,14 @@ def create_listing(api, image_url, title, descr, price, condition):
         }
         
         print("\nCreating the listing with final completed data...")
-        response = api.execute('AddItem', item_details)
+        response = trading_post(
+            'AddItem', headers={"Content-Type": "text/xml"},
+            data=build_request('AddItem', to_xml("Item", item_details["Item"]), SANDBOX_TOKEN).encode("utf-8"))
+        response.raise_for_status()
+        parsed = parse_response(response.content, ("ItemID",))
         
-        if response.reply.Ack == 'Success':
-            item_id = response.reply.ItemID
+        if is_success(parsed):
+            item_id = parsed["ItemID"]
             print("==========================================")
             print("      LISTING CREATED SUCCESSFULLY!       ")
             print("==========================================")
@@ -99,30 +100,15 @@ def create_listing(api, image_url, title, descr, price, condition):
             print(f"View your sandbox listing at: v{item_id}")
         else:
             print("Error creating listing:")
-            print(response.reply.Errors)
-            errors = response.reply.Errors
-            if not isinstance(errors, list):
-                errors = [errors]  # normalize single error to list
-
-            for error in errors:
-                if getattr(error, "SeverityCode", None) == 'Error':
-                    print(f"- {error.ShortMessage}: {error.LongMessage}")
+            for error in parsed["errors"]:
+                print(f"- {error}")
 
-    except ConnectionError as e:
+    except requests.exceptions.RequestException as e:
         print(f"Connection Error during listing creation: {e}")
-        print(e.response.dict())
 
 if __name__ == "__main__":
-    # --- HARDCODE CREDENTIALS FOR DEBUGGING ---
-    # Paste your credentials from your ebay.yaml file directly here.
-    # Ensure they are strings (inside quotes).
-
-    MY_SANDBOX_APP_ID = "JuanFern-HackHarv-SBX-788fbab9a-6f33a2ab"
-    MY_SANDBOX_DEV_ID = "57016d2d-f4a4-424d-98c5-81f93508e0f3"
-    MY_SANDBOX_CERT_ID = "SBX-88fbab9a6687-6f93-4d5e-a5df-db99"
-    MY_SANDBOX_TOKEN = "v^1.1#i^1#f^0#r^1#I^3#p^3#t^Ul4xMF8yOjgzNjQ1NkYxMzExNjA4NEZEQUMyQTc5OTQyREMwNzlGXzFfMSNFXjEyODQ="
-    
-    # ---------------------------------------------
+    # Uses the sandbox keys and the keep-alive session from trading.py,
+    # shared by every Trading API call site
 
     # Ensure you have a test image named 'test.jpg' in the same directory
     image_file_path = "test.jpg"
@@ -131,31 +117,13 @@ if __name__ == "__main__":
         print("Please create a dummy image file with that name to run this script.")
     else:
         try:
-            print("Initializing API connection with hardcoded credentials...")
-            
-            # Initialize the Trading API, passing credentials directly
-            # instead of using config_file
-            api = Trading(
-                domain='api.sandbox.ebay.com', # CRITICAL: This targets the sandbox
-                appid=MY_SANDBOX_APP_ID,
-                devid=MY_SANDBOX_DEV_ID,
-                certid=MY_SANDBOX_CERT_ID,
-                token=MY_SANDBOX_TOKEN,
-                config_file=None # Explicitly disable config file loading
-            )
-            
             # Step 1: Upload the image
-            hosted_image_url = upload_image_to_ebay(api, image_file_path)
+            hosted_image_url = upload_image_to_ebay(image_file_path)
             
             # Step 2: If image upload was successful, create the listing
             if hosted_image_url:
-                # api, image_url, title, descr, price, condition
-                create_listing(api, hosted_image_url, "cheese", "some cheese", 20, "good")
+                # image_url, title, descr, price, condition
+                create_listing(hosted_image_url, "cheese", "some cheese", 20, "good")
 
-        except ConnectionError as e:
-            # This is a more specific catch for API connection issues
-            print(f"A ConnectionError occurred: {e}")
-            print("Full response details:")
-            print(e.response.text) # Print the raw text from eBay's server
         except Exception as e:
-            print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+            print(f"An unexpected error occurred: {e}")
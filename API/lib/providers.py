@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+import time
+
+from lib.model_backends import create_model_backend
+
+# Initialize the model in the background at startup instead of on the first request
+PROVIDER_WARMUP = os.environ.get("PROVIDER_WARMUP", "1") == "1"
+
+
+class LazyProvider:
+    """
+    Builds an expensive client (imports, SDK init) the first time it is used
+    instead of at import time, so workers start serving right away. Concurrent
+    first callers wait for the same initialization; a failed one is retried on
+    the next call. aget() runs the initialization in a worker thread so the
+    event loop keeps serving meanwhile.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+        self.init_seconds = None
+        self.error = None
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not None
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    start = time.perf_counter()
+                    try:
+                        value = self.factory()
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                    self.init_seconds = time.perf_counter() - start
+                    self.error = None
+                    self._value = value
+                    print(f"Initialized {self.name} in {self.init_seconds:.2f}s")
+        return self._value
+
+    async def aget(self):
+        if self._value is not None:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    async def warm_up(self):
+        try:
+            await self.aget()
+        except Exception as e:
+            print(f"Could not initialize {self.name}: {e}")
+
+    def override(self, value):
+        """
+        Replaces the provided object, e.g. with a fake in tests and benchmarks.
+        """
+        self._value = value
+
+    def stats(self):
+        return {"ready": self.ready, "initSeconds": self.init_seconds, "error": self.error}
+
+
+# The analysis model backend selected by MODEL_BACKEND (lib/model_backends.py)
+model_backend = LazyProvider("model", create_model_backend)
+
+# Warmed up in the background at startup and checked by /ready
+WARMUP_PROVIDERS = (model_backend,)
+
+
+async def warm_up_providers():
+    await asyncio.gather(*(provider.warm_up() for provider in WARMUP_PROVIDERS))
+
+
+def providers_ready() -> bool:
+    return all(provider.ready for provider in WARMUP_PROVIDERS)
+
+
+def provider_stats():
+    return {provider.name: provider.stats() for provider in WARMUP_PROVIDERS}
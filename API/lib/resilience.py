@@ -0,0 +1,140 @@
+import asyncio
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is unhealthy. After failure_threshold
+    consecutive failures the circuit opens and calls raise CircuitOpen
+    immediately. Once reset_timeout has passed, up to half_open_probes calls are
+    let through: one success closes the circuit, one failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_probes: int = 1, is_failure=lambda e: True):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def _before_call(self):
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpen(f"{self.name} circuit is open")
+            self.state = HALF_OPEN
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpen(f"{self.name} circuit is half-open and probing")
+            self._probes += 1
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        print(f"{self.name} circuit opened after {self.failures} failures")
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != CLOSED:
+            print(f"{self.name} circuit closed")
+        self.state = CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    async def call(self, make_call):
+        self._before_call()
+        probing = self.state == HALF_OPEN
+        try:
+            result = await make_call()
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            elif self.state == HALF_OPEN:
+                # The dependency answered, just not with what we wanted
+                self.record_success()
+            raise
+        except BaseException:
+            # Cancelled: nothing was learned, so free the probe slot for the next call
+            if probing and self.state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutiveFailures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """
+    Rolling window of request latencies for picking the hedge delay.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def hedged(make_request, delay: float | None):
+    """
+    Starts make_request(); if it hasn't finished after `delay` seconds, starts a
+    second identical request and returns whichever succeeds first. Only use for
+    idempotent requests. Returns (result, hedge_was_sent).
+    """
+    first = asyncio.ensure_future(make_request())
+    if delay is None:
+        return await first, False
+
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result(), False
+
+    pending = {first, asyncio.ensure_future(make_request())}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), True
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
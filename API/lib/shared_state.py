@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+
+# "memory" keeps state in each process. "sqlite" shares it between the workers
+# on one machine through STATE_DB, and a redis:// URL (needs the redis package)
+# shares it between machines.
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")
+STATE_DB = os.environ.get("STATE_DB", "state.db")
+# Seconds a Redis call may take before failing, so a hung server can't stall a worker
+STATE_TIMEOUT = float(os.environ.get("STATE_TIMEOUT", 2))
+# Expired keys are purged once every this many writes
+STATE_PURGE_EVERY = 500
+
+
+class MemoryBackend:
+    """
+    Per-process key/value store with expiry. The default; nothing is shared.
+    """
+
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._entries = {}
+        self._writes = 0
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        self._entries[key] = (time.time() + ttl, value)
+        self._writes += 1
+        if self._writes % STATE_PURGE_EVERY == 0:
+            now = time.time()
+            for expired in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[expired]
+
+    def add(self, key: str, value, ttl: float) -> bool:
+        """
+        Sets key only if it is missing or expired. Returns whether it was set.
+        """
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+
+class SqliteBackend:
+    """
+    Key/value store with expiry in a SQLite file in WAL mode, shared by every
+    process on the machine. Values are stored as JSON. Calls block, so async
+    callers run them with asyncio.to_thread.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, db_path: str = STATE_DB):
+        self.db_path = db_path
+        self._initialized = False
+        self._writes = 0
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None)) as conn:
+            # Safe with WAL: a power loss can drop the last writes but never corrupts the file
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS state (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )""")
+                self._initialized = True
+            yield conn
+
+    def get(self, key: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM state WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value, ttl: float):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl))
+            self._writes += 1
+            if self._writes % STATE_PURGE_EVERY == 0:
+                conn.execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+
+    def add(self, key: str, value, ttl: float) -> bool:
+        """
+        Sets key only if it is missing or expired. Returns whether it was set.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+                "WHERE state.expires_at <= ?",
+                (key, json.dumps(value), now + ttl, now))
+            return cursor.rowcount > 0
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    """
+    Key/value store on a Redis-compatible server, shared by every process that
+    points at it. Values are stored as JSON. Calls block, so async callers run
+    them with asyncio.to_thread.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("STATE_BACKEND is a redis:// URL but the redis package is not installed")
+        self._redis = redis.Redis.from_url(url, socket_timeout=STATE_TIMEOUT, socket_connect_timeout=STATE_TIMEOUT)
+
+    def get(self, key: str):
+        value = self._redis.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value, ttl: float):
+        self._redis.set(key, json.dumps(value), px=max(int(ttl * 1000), 1))
+
+    def add(self, key: str, value, ttl: float) -> bool:
+        """
+        Sets key only if it is missing or expired. Returns whether it was set.
+        """
+        return bool(self._redis.set(key, json.dumps(value), px=max(int(ttl * 1000), 1), nx=True))
+
+    def delete(self, key: str):
+        self._redis.delete(key)
+
+
+def create_backend(spec: str = STATE_BACKEND):
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(spec)
+    if spec == "sqlite":
+        return SqliteBackend()
+    if spec == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown STATE_BACKEND {spec!r}; expected memory, sqlite or a redis:// URL")
+
+
+shared_state = create_backend()
@@ -0,0 +1,74 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TRADING_ENDPOINT = os.environ.get("EBAY_TRADING_ENDPOINT", "https://api.sandbox.ebay.com/ws/api.dll")
+TRADING_POOL_SIZE = int(os.environ.get("TRADING_POOL_SIZE", 10))
+TRADING_TIMEOUT = float(os.environ.get("TRADING_TIMEOUT", 60))
+
+# Sandbox application keys, shared by every Trading API call site
+SANDBOX_APP_ID = "JuanFern-HackHarv-SBX-788fbab9a-6f33a2ab"
+SANDBOX_DEV_ID = "57016d2d-f4a4-424d-98c5-81f93508e0f3"
+SANDBOX_CERT_ID = "SBX-88fbab9a6687-6f93-4d5e-a5df-db99"
+SANDBOX_TOKEN = "v^1.1#i^1#f^0#r^1#I^3#p^3#t^Ul4xMF8yOjgzNjQ1NkYxMzExNjA4NEZEQUMyQTc5OTQyREMwNzlGXzFfMSNFXjEyODQ="
+
+BASE_HEADERS = {
+    "X-EBAY-API-COMPATIBILITY-LEVEL": "1193",
+    "X-EBAY-API-DEV-NAME": SANDBOX_DEV_ID,
+    "X-EBAY-API-APP-NAME": SANDBOX_APP_ID,
+    "X-EBAY-API-CERT-NAME": SANDBOX_CERT_ID,
+    "X-EBAY-API-SITEID": "0",
+}
+
+
+class KeepAliveSession(requests.Session):
+    """
+    requests.Session whose close() keeps the pool open, so a caller that closes
+    its session after every response doesn't throw away keep-alive.
+    """
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_trading_session() -> KeepAliveSession:
+    """
+    Returns the process-wide keep-alive session used for all Trading API traffic.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = KeepAliveSession()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TRADING_POOL_SIZE, max_retries=3)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def trading_post(call_name: str, headers: dict | None = None, **kwargs) -> requests.Response:
+    """
+    POSTs a raw Trading API call over the shared session.
+    """
+    request_headers = dict(BASE_HEADERS)
+    request_headers["X-EBAY-API-CALL-NAME"] = call_name
+    if headers:
+        request_headers.update(headers)
+    kwargs.setdefault("timeout", TRADING_TIMEOUT)
+    return get_trading_session().post(TRADING_ENDPOINT, headers=request_headers, **kwargs)
+
+
+def close_trading_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.shutdown()
+            _session = None
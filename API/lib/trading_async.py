@@ -0,0 +1,134 @@
+import asyncio
+import time
+import xml.etree.ElementTree as ET
+
+import httpx
+
+from lib.http_client import get_http_client
+from lib.picture_cache import picture_cache, picture_digest
+from lib.trading_xml import SUCCESS_ACKS, build_request, parse_response, to_xml
+from lib.trading import BASE_HEADERS, SANDBOX_TOKEN, TRADING_ENDPOINT, TRADING_TIMEOUT
+
+NS = {"eb": "urn:ebay:apis:eBLBaseComponents"}
+# Picture uploads can take much longer than a Browse search
+TRADING_HTTP_TIMEOUT = httpx.Timeout(TRADING_TIMEOUT, connect=5.0)
+
+
+class TradingError(Exception):
+    pass
+
+
+def _errors(root) -> str:
+    messages = [
+        (error.findtext("eb:LongMessage", namespaces=NS) or error.findtext("eb:ShortMessage", namespaces=NS) or "")
+        for error in root.findall("eb:Errors", NS)
+        if error.findtext("eb:SeverityCode", namespaces=NS) != "Warning"
+    ]
+    return ", ".join(m for m in messages if m) or "Unknown error"
+
+
+async def _post_call(call_name: str, data: dict | None = None, files: dict | None = None) -> bytes:
+    headers = dict(BASE_HEADERS)
+    headers["X-EBAY-API-CALL-NAME"] = call_name
+    body = "".join(to_xml(tag, value) for tag, value in (data or {}).items())
+    xml_body = build_request(call_name, body, SANDBOX_TOKEN)
+
+    client = get_http_client()
+    if files:
+        # The XML payload must be the first part of the multipart body
+        parts = {"XMLPayload": (None, xml_body, "text/xml")}
+        parts.update(files)
+        response = await client.post(
+            TRADING_ENDPOINT, headers=headers, files=parts, timeout=TRADING_HTTP_TIMEOUT)
+    else:
+        headers["Content-Type"] = "text/xml"
+        response = await client.post(
+            TRADING_ENDPOINT, headers=headers, content=xml_body.encode("utf-8"), timeout=TRADING_HTTP_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+async def trading_call_async(call_name: str, data: dict | None = None, files: dict | None = None,
+                             fields: tuple = ()) -> dict:
+    """
+    Sends a Trading API call over the shared async client and pulls Ack, the
+    wanted fields and the errors out of the response with the streaming parser
+    (trading_xml.parse_response). Raises TradingError unless eBay acknowledges it.
+    """
+    result = parse_response(await _post_call(call_name, data, files), fields)
+    if result["Ack"] not in SUCCESS_ACKS:
+        raise TradingError(f"{call_name} failed: {', '.join(result['errors']) or 'Unknown error'}")
+    return result
+
+
+async def upload_picture(image_data: bytes, picture_name: str = "ListingImage",
+                         content_type: str = "image/jpeg", extension_days: int | None = None) -> str:
+    """
+    Uploads image bytes to eBay Picture Services and returns the hosted FullURL.
+    Pictures already hosted (same bytes, not yet expired) are not uploaded again.
+    """
+    digest = picture_digest(image_data)
+    cached_url = await asyncio.to_thread(picture_cache.get, digest)
+    if cached_url:
+        return cached_url
+
+    data = {"PictureName": picture_name}
+    if extension_days is not None:
+        data["ExtensionInDays"] = extension_days
+    start = time.monotonic()
+    result = await trading_call_async(
+        "UploadSiteHostedPictures", data, files={"file": ("image.jpg", image_data, content_type)},
+        fields=("FullURL",))
+    url = result["FullURL"]
+    if not url:
+        raise TradingError("UploadSiteHostedPictures succeeded but returned no URL")
+    await asyncio.to_thread(
+        picture_cache.set, digest, url, len(image_data), time.monotonic() - start, extension_days)
+    return url
+
+
+async def verify_add_item(item: dict) -> bool:
+    await trading_call_async("VerifyAddItem", {"Item": item})
+    return True
+
+
+async def add_item(item: dict) -> str:
+    result = await trading_call_async("AddItem", {"Item": item}, fields=("ItemID",))
+    item_id = result["ItemID"]
+    if not item_id:
+        raise TradingError("AddItem succeeded but returned no ItemID")
+    return item_id
+
+
+async def end_item(item_id: str, reason: str = "NotAvailable"):
+    await trading_call_async("EndItem", {"ItemID": item_id, "EndingReason": reason})
+
+
+async def get_item(item_id: str) -> dict:
+    result = await trading_call_async(
+        "GetItem", {"ItemID": item_id, "DetailLevel": "ReturnAll"}, fields=("ViewItemURL", "ListingStatus"))
+    return {
+        "itemId": item_id,
+        "viewItemUrl": result["ViewItemURL"],
+        "listingStatus": result["ListingStatus"],
+    }
+
+
+async def add_items(items: list) -> list:
+    """
+    Lists up to 5 items in one AddItems call. Returns one (item_id, error) pair
+    per item, in input order; exactly one of the two is None.
+    """
+    containers = [{"MessageID": str(i), "Item": item} for i, item in enumerate(items)]
+    # Needs every container's result, not just the first ItemID, so this one
+    # is parsed into a tree; the Ack is not checked since failures are per item
+    root = ET.fromstring(await _post_call("AddItems", {"AddItemRequestContainer": containers}))
+
+    results = [(None, _errors(root))] * len(items)
+    for container in root.findall("eb:AddItemResponseContainer", NS):
+        index = int(container.findtext("eb:CorrelationID", namespaces=NS) or -1)
+        if not 0 <= index < len(items):
+            continue
+        item_id = container.findtext("eb:ItemID", namespaces=NS)
+        results[index] = (item_id, None) if item_id else (None, _errors(container))
+    return results
@@ -0,0 +1,187 @@
+import string
+import xml.etree.ElementTree as ET
+
+# Imported both as lib.trading_xml and as trading_xml (scripts run from lib/),
+# so this module must not import anything from lib.
+
+EBAY_NS = "urn:ebay:apis:eBLBaseComponents"
+SUCCESS_ACKS = ("Success", "Warning")
+_ERROR_TAGS = {f"{{{EBAY_NS}}}{name}": name for name in ("ShortMessage", "LongMessage", "SeverityCode")}
+_ERRORS_TAG = f"{{{EBAY_NS}}}Errors"
+# Responses are fed to the pull parser in chunks so it can stop early
+PARSE_CHUNK = 1024
+
+
+def escape(value) -> str:
+    """
+    Escapes text for XML element content and double-quoted attributes.
+    """
+    text = str(value)
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    return text
+
+
+class XmlTemplate:
+    """
+    XML template with {name} placeholders, compiled once into a Python function
+    that joins the literal chunks with the values. render() escapes every value
+    unless its placeholder is written {name:raw}, which is for already-rendered
+    XML fragments.
+    """
+
+    def __init__(self, source: str):
+        parts = []
+        for literal, field, spec, _ in string.Formatter().parse(source):
+            if literal:
+                parts.append(repr(literal))
+            if field is not None:
+                parts.append(f"v[{field!r}]" if spec == "raw" else f"e(v[{field!r}])")
+        code = f"lambda v, e: ''.join(({', '.join(parts)},))"
+        self._render = eval(compile(code, "<XmlTemplate>", "eval"))
+
+    def render(self, **values) -> str:
+        return self._render(values, escape)
+
+
+REQUEST_TEMPLATE = XmlTemplate(
+    '<?xml version="1.0" encoding="utf-8"?>'
+    f'<{{call_name:raw}}Request xmlns="{EBAY_NS}">{{credentials:raw}}{{body:raw}}</{{call_name:raw}}Request>'
+)
+CREDENTIALS_TEMPLATE = XmlTemplate(
+    "<RequesterCredentials><eBayAuthToken>{token}</eBayAuthToken></RequesterCredentials>"
+)
+
+ITEM_TEMPLATE = XmlTemplate("""<Item>
+  <Title>{title}</Title>
+  <Description>{description}</Description>
+  <PrimaryCategory><CategoryID>9355</CategoryID></PrimaryCategory>
+  <ConditionID>1000</ConditionID>
+  <ListingType>{listing_type}</ListingType>
+  <ListingDuration>{listing_duration}</ListingDuration>
+  <StartPrice currencyID="{currency}">{start_price}</StartPrice>
+  <Quantity>{quantity}</Quantity>
+  <Country>{country}</Country>
+  <Currency>{currency}</Currency>
+  <PostalCode>{postal_code}</PostalCode>
+  <DispatchTimeMax>2</DispatchTimeMax>
+  <ItemSpecifics>
+    <NameValueList><Name>Brand</Name><Value>Apple</Value></NameValueList>
+    <NameValueList><Name>Model</Name><Value>iPhone 12</Value></NameValueList>
+    <NameValueList><Name>Storage Capacity</Name><Value>128 GB</Value></NameValueList>
+    <NameValueList><Name>Color</Name><Value>Black</Value></NameValueList>
+  </ItemSpecifics>
+  <ReturnPolicy>
+    <ReturnsAcceptedOption>ReturnsAccepted</ReturnsAcceptedOption>
+    <ReturnsWithinOption>Days_30</ReturnsWithinOption>
+    <RefundOption>MoneyBack</RefundOption>
+    <ShippingCostPaidByOption>Buyer</ShippingCostPaidByOption>
+  </ReturnPolicy>
+  <ShippingDetails>
+    <ShippingServiceOptions>
+      <ShippingServicePriority>1</ShippingServicePriority>
+      <ShippingService>USPSPriority</ShippingService>
+      <ShippingServiceCost currencyID="USD">5.00</ShippingServiceCost>
+    </ShippingServiceOptions>
+  </ShippingDetails>
+  <PictureDetails>
+    <PictureURL>{picture_url}</PictureURL>
+  </PictureDetails>
+  <CategoryMappingAllowed>true</CategoryMappingAllowed>
+</Item>""")
+
+ITEM_DEFAULTS = {
+    "title": "Default Item Title",
+    "description": "Default item description",
+    "picture_url": "https://i.ebayimg.sandbox.ebaystatic.com/aw/pics/s_1x2.gif",
+    "listing_type": "FixedPriceItem",
+    "listing_duration": "GTC",
+    "start_price": "19.99",
+    "quantity": "1",
+    "country": "US",
+    "currency": "USD",
+    "postal_code": "94105",
+}
+
+
+def render_item(**fields) -> str:
+    """
+    Renders the <Item> block used by the Trading scripts; missing fields fall
+    back to ITEM_DEFAULTS.
+    """
+    return ITEM_TEMPLATE.render(**{**ITEM_DEFAULTS, **fields})
+
+
+def build_request(call_name: str, body: str = "", token: str | None = None) -> str:
+    """
+    Wraps an already-rendered body in the <CallNameRequest> envelope, with
+    RequesterCredentials when a token is given.
+    """
+    credentials = CREDENTIALS_TEMPLATE.render(token=token) if token is not None else ""
+    return REQUEST_TEMPLATE.render(call_name=call_name, credentials=credentials, body=body)
+
+
+def to_xml(tag: str, value) -> str:
+    """
+    Serializes ebaysdk-style request data: dicts become child elements, lists
+    repeat the element, and {"#text": ..., "@attrs": {...}} sets attributes.
+    """
+    if isinstance(value, list):
+        return "".join(to_xml(tag, item) for item in value)
+    attrs = ""
+    if isinstance(value, dict) and "#text" in value:
+        attrs = "".join(f' {name}="{escape(v)}"' for name, v in value.get("@attrs", {}).items())
+        value = value["#text"]
+    if isinstance(value, dict):
+        inner = "".join(to_xml(child, child_value) for child, child_value in value.items())
+    else:
+        inner = escape(value)
+    return f"<{tag}{attrs}>{inner}</{tag}>"
+
+
+def parse_response(content, fields=("ItemID",)) -> dict:
+    """
+    Pulls Ack, the first value of each wanted element (in the eBay namespace,
+    at any depth) and the error messages out of a Trading API response without
+    building the whole tree. eBay puts Ack and Errors ahead of the payload, so
+    on success parsing stops as soon as every field has been seen.
+
+    Returns {"Ack": ..., field: text or None, ..., "errors": [message, ...]}.
+    """
+    names = ("Ack",) + tuple(fields)
+    result = dict.fromkeys(names)
+    result["errors"] = []
+    wanted = {f"{{{EBAY_NS}}}{name}": name for name in names}
+    error = {}
+    parser = ET.XMLPullParser(events=("end",))
+
+    for offset in range(0, len(content), PARSE_CHUNK):
+        parser.feed(content[offset:offset + PARSE_CHUNK])
+        for _, element in parser.read_events():
+            tag = element.tag
+            name = wanted.pop(tag, None)
+            if name is not None:
+                result[name] = element.text
+            elif tag in _ERROR_TAGS:
+                error[_ERROR_TAGS[tag]] = element.text
+            elif tag == _ERRORS_TAG:
+                if error.get("SeverityCode") != "Warning":
+                    message = error.get("LongMessage") or error.get("ShortMessage")
+                    if message:
+                        result["errors"].append(message)
+                error = {}
+            element.clear()
+        if not wanted and result["Ack"] in SUCCESS_ACKS:
+            return result
+    parser.close()
+    return result
+
+
+def is_success(response: dict) -> bool:
+    return response.get("Ack") in SUCCESS_ACKS
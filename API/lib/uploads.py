@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import PlainTextResponse
+
+# Largest single image we accept; phone photos are well under this
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", 25 * 1024 * 1024))
+# Largest request body, which covers batch uploads and zip archives
+UPLOAD_MAX_REQUEST_BYTES = int(os.environ.get("UPLOAD_MAX_REQUEST_BYTES", 512 * 1024 * 1024))
+# Uploads up to this size stay in memory; larger ones are spooled to disk
+UPLOAD_MEMORY_LIMIT = int(os.environ.get("UPLOAD_MEMORY_LIMIT", 1024 * 1024))
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR") or None
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class SpooledUpload:
+    """
+    One uploaded file, read chunk by chunk: it is hashed while it is copied and
+    kept in memory only if it is small, otherwise it lives in a named temp file.
+    `source` is what downstream code gets: the bytes, or the file path so the
+    image prep workers can open it themselves instead of receiving a pickled
+    copy. Use as a context manager, or call close(), to delete the temp file.
+    """
+
+    def __init__(self, filename: str, content_type: str):
+        self.filename = filename
+        self.content_type = content_type
+        self.digest = None
+        self.size = 0
+        self.path = None
+        self._data = None
+
+    @property
+    def source(self) -> bytes | str:
+        return self.path if self.path is not None else self._data
+
+    def read_bytes(self) -> bytes:
+        """
+        Returns the whole upload as bytes. Only for consumers that really need
+        it in memory (the job queue, fallbacks when preprocessing fails).
+        """
+        if self.path is None:
+            return self._data
+        with open(self.path, "rb") as file:
+            return file.read()
+
+    def close(self):
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _spool(fileobj, upload: SpooledUpload, max_bytes: int):
+    hasher = hashlib.sha256()
+    buffer = bytearray()
+    spool = None
+    try:
+        while True:
+            chunk = fileobj.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            upload.size += len(chunk)
+            if upload.size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{upload.filename or 'Upload'} is larger than {max_bytes // (1024 * 1024)} MB.")
+            hasher.update(chunk)
+            if spool is None and len(buffer) + len(chunk) > UPLOAD_MEMORY_LIMIT:
+                spool = tempfile.NamedTemporaryFile(prefix="upload-", dir=UPLOAD_SPOOL_DIR, delete=False)
+                upload.path = spool.name
+                spool.write(buffer)
+                buffer = None
+            if spool is not None:
+                spool.write(chunk)
+            else:
+                buffer += chunk
+    except BaseException:
+        if spool is not None:
+            spool.close()
+        upload.close()
+        raise
+    if spool is not None:
+        spool.close()
+    else:
+        upload._data = bytes(buffer)
+    upload.digest = hasher.hexdigest()
+
+
+async def ingest_upload(image: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledUpload:
+    """
+    Streams an UploadFile into a SpooledUpload, enforcing max_bytes (413) and
+    computing the SHA-256 on the way. Never holds more than one chunk plus
+    UPLOAD_MEMORY_LIMIT of it in memory.
+    """
+    upload = SpooledUpload(image.filename, image.content_type)
+    if image.size is not None and image.size > max_bytes:
+        raise HTTPException(
+            status_code=413, detail=f"{image.filename or 'Upload'} is larger than {max_bytes // (1024 * 1024)} MB.")
+    await image.seek(0)
+    await asyncio.to_thread(_spool, image.file, upload, max_bytes)
+    return upload
+
+
+def read_source(source: bytes | str) -> bytes:
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            return file.read()
+    return source
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimit:
+    """
+    ASGI middleware that rejects request bodies over max_bytes with a 413,
+    from Content-Length up front or by counting a chunked body as it arrives,
+    before the multipart parser spools it.
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        too_large = PlainTextResponse(
+            f"Request body is larger than {self.max_bytes // (1024 * 1024)} MB.", status_code=413)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            return await too_large(scope, receive, send)
+
+        received = 0
+        exceeded = responded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def limited_send(message):
+            nonlocal responded
+            # The app may turn the aborted body read into its own error response;
+            # replace it with the 413
+            if exceeded:
+                if message["type"] == "http.response.start" and not responded:
+                    responded = True
+                    await too_large(scope, receive, send)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except _BodyTooLarge:
+            if not responded:
+                await too_large(scope, receive, send)
@@ -1,29 +1,76 @@
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part, Image, GenerationConfig
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.concurrency import run_in_threadpool
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 import uvicorn
+import asyncio
 import json
 import os
 from typing import List
-from lib.ebay import search_items
+from lib.ebay import token_provider, search_stats
+from lib.comparables_cache import comparables_cache
+from lib.analysis import (
+    stream_analysis, prepare_analysis, remember_analysis, analyze_image_bytes, save_draft,
+    ANALYSIS_MODE, ANALYSIS_MODES, degraded_stats)
+from lib.batch import list_zip_images, ZipMember, BATCH_MAX_IMAGES
+from lib.analysis_cache import analysis_cache
+from lib.phash import near_duplicate_index
+from lib.image_prep import prepare_image, shutdown_executor
+from lib.uploads import BodySizeLimit, SpooledUpload, ingest_upload, UPLOAD_MAX_REQUEST_BYTES
+from lib.http_client import start_http_client, close_http_client
+from lib.jobs import job_queue, QueueFull, InvalidWebhook, check_webhook_url
+from lib.governor import model_governor, MODEL_CONCURRENCY
+from lib.trading import close_trading_session
+from lib.picture_cache import picture_cache
+from lib.drafts import draft_store
+from lib.providers import model_backend, warm_up_providers, providers_ready, provider_stats, PROVIDER_WARMUP
+from lib.trading_async import upload_picture
+
+from lib.ebay_logic import create_ebay_listing_async, create_ebay_listings_bulk, EbayItemResponse
+
+# The model backend is initialized on first use (or by the warm-up below), not at import
+_started = False
+
+
+async def get_model():
+    try:
+        return await model_backend.aget()
+    except Exception as e:
+        print(
+            f"Fatal: Could not initialize the model backend. Please check your authentication. Error: {e}")
+        raise HTTPException(
+            status_code=503, detail="The model is not available. Please try again later.")
+
+
+async def _run_analysis_job(image_data: bytes, content_type: str, mode: str | None):
+    return await analyze_image_bytes(await get_model(), image_data, content_type, mode or ANALYSIS_MODE)
 
-from lib.ebay_logic import create_ebay_listing, EbayItemResponse
 
-PROJECT_ID = os.environ["PROJECT_ID"]
-MAX_RETRIES = 3
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _started
+    await start_http_client()
+    token_provider.start()
+    await job_queue.start(_run_analysis_job)
+    warm_up = asyncio.create_task(warm_up_providers()) if PROVIDER_WARMUP else None
+    _started = True
+    yield
+    _started = False
+    if warm_up is not None:
+        warm_up.cancel()
+    await job_queue.stop()
+    await token_provider.stop()
+    await close_http_client()
+    close_trading_session()
+    shutdown_executor()
 
-try:
-    vertexai.init(project=PROJECT_ID)
-    model = GenerativeModel("gemini-2.5-flash")
-except Exception as e:
-    print(
-        f"Fatal: Could not initialize Vertex AI. Please check your authentication. Error: {e}")
 
 app = FastAPI(
     title="HackHarvard API",
+    lifespan=lifespan,
 )
+app.add_middleware(BodySizeLimit, max_bytes=UPLOAD_MAX_REQUEST_BYTES)
 
 
 class EstimatedPrice(BaseModel):
@@ -40,6 +87,14 @@ class ImageAnalysisResponse(BaseModel):
     condition: str = Field(...)
     estimatedPrice: EstimatedPrice
     imageQuality: str = Field(...)
+    draftId: str | None = None
+
+
+class BulkListing(BaseModel):
+    title: str = Field(..., min_length=1)
+    description: str = Field(...)
+    price: float = Field(..., gt=0, strict=True, allow_inf_nan=False)
+    condition: str = Field(...)
 
 
 @app.post("/post/", response_model=EbayItemResponse)
@@ -48,23 +103,47 @@ async def post_listing(
     description: str = Form(...),
     price: float = Form(...),
     condition: str = Form(...),
-    image: UploadFile = File(...)
+    image: UploadFile | None = File(None),
+    draft_id: str | None = Form(None)
 ):
-    if not image.content_type.startswith("image/"):
+    """
+    Publishes a listing. Pass the draftId returned by /analyze-image/ to reuse
+    the photo already on the server, or upload the image again.
+    """
+    if draft_id is not None:
+        draft = await draft_store.get(draft_id)
+        if draft is None:
+            raise HTTPException(
+                status_code=404, detail="Draft not found or expired. Please analyze the image again.")
+    elif image is None:
+        raise HTTPException(
+            status_code=400, detail="Either draft_id or image is required.")
+    elif not image.content_type.startswith("image/"):
         raise HTTPException(
             status_code=400, detail="Invalid file type. Please upload an image.")
 
     try:
-        image_data = await image.read()
-
-        listing_response = await run_in_threadpool(
-            create_ebay_listing,
-            title=title,
-            description=description,
-            price=price,
-            condition=condition,
-            image_data=image_data
-        )
+        if draft_id is not None:
+            picture_url = draft.picture_url
+            if picture_url is None:
+                picture_url = await upload_picture(draft.image, picture_name="ListingImage")
+                await draft_store.set_picture_url(draft_id, picture_url)
+            listing_response = await create_ebay_listing_async(
+                title=title,
+                description=description,
+                price=price,
+                condition=condition,
+                picture_url=picture_url
+            )
+            draft_store.published += 1
+        else:
+            listing_response = await create_ebay_listing_async(
+                title=title,
+                description=description,
+                price=price,
+                condition=condition,
+                image_data=await _prepare_listing_image(image)
+            )
         print(listing_response)
         return listing_response
 
@@ -74,132 +153,286 @@ async def post_listing(
             status_code=500, detail=f"Failed to create eBay listing: {str(e)}")
 
 
-@app.post("/analyze-image/", response_model=ImageAnalysisResponse)
-async def analyze_image(image: UploadFile = File(...)):
-    if not image.content_type.startswith("image/"):
+async def _prepare_listing_image(image: UploadFile) -> bytes:
+    with await ingest_upload(image) as upload:
+        try:
+            prepared = await prepare_image(upload.source, targets=("ebay",), with_hash=False)
+            return prepared.variants["ebay"]
+        except Exception as e:
+            print(f"Could not preprocess image, uploading original: {e}")
+            return upload.read_bytes()
+
+
+@app.post("/post/bulk")
+async def post_listings_bulk(
+    listings: str = Form(...),
+    images: list[UploadFile] = File(...)
+):
+    """
+    Publishes several listings in one request. `listings` is a JSON array of
+    {title, description, price, condition} objects (BulkListing), one per
+    uploaded image, in the same order. Each listing succeeds or fails on its own.
+    """
+    try:
+        listing_fields = json.loads(listings)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="listings must be a JSON array.")
+    if not isinstance(listing_fields, list) or len(listing_fields) != len(images):
         raise HTTPException(
-            status_code=400, detail="Invalid file type. Please upload an image.")
+            status_code=400, detail="listings must be a JSON array with one entry per image.")
+    if len(images) > BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400, detail=f"At most {BATCH_MAX_IMAGES} listings per request.")
+    bulk_listings = []
+    for index, (fields, image) in enumerate(zip(listing_fields, images)):
+        try:
+            bulk_listings.append(BulkListing.model_validate(fields))
+        except ValidationError as e:
+            problems = "; ".join(
+                f"{'.'.join(map(str, error['loc'])) or 'entry'}: {error['msg']}" for error in e.errors())
+            raise HTTPException(status_code=400, detail=f"Listing {index} is invalid: {problems}.")
+        if not image.content_type.startswith("image/"):
+            raise HTTPException(
+                status_code=400, detail=f"Listing {index} has an invalid file type. Please upload an image.")
+
+    image_data = await asyncio.gather(*(_prepare_listing_image(image) for image in images))
+    results = await create_ebay_listings_bulk([
+        {**listing.model_dump(), "image_data": data} for listing, data in zip(bulk_listings, image_data)
+    ])
+    return {
+        "results": results,
+        "published": sum(1 for r in results if "itemId" in r),
+        "failed": sum(1 for r in results if "error" in r),
+    }
+
+
+async def _ingest_image(image: UploadFile) -> SpooledUpload:
     try:
-        image_data = await image.read()
-        image_part = Part.from_data(
-            data=image_data, mime_type=image.content_type)
+        return await ingest_upload(image)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error reading file: {e}")
         raise HTTPException(
             status_code=500, detail=f"Failed to read uploaded image: {e}")
 
-    generation_config = GenerationConfig(
-        response_mime_type="application/json",
-    )
-
-    prompt_1_identify = """
-    You are an expert e-commerce analyst. Your task is to identify the item in the image and provide structured data about it.
-    The primary goal is to extract hyper-specific keywords for a market analysis. Include model numbers, series, or any unique identifiers visible.
-    You MUST respond with ONLY a valid JSON object. Do not include any other text, explanations, or markdown formatting.
-
-    Use the following JSON schema:
-    {
-    "item": "The most likely name of the item, including series or model if possible.",
-    "brand": "The brand of the item, or 'Unknown' if not identifiable.",
-    "description": "A concise, one-sentence description of the item.",
-    "imageQuality": "A classification of the image quality (Excellent, Good, Fair, Poor).",
-    "searchKeywords": [
-        "A list of 3-5 precise string keywords for finding this EXACT item on a marketplace."
-    ],
-    "condition": "Item condition based on visual inspection (e.g., 'New', 'Used - Like New', 'Used - Good', 'For parts')."
-    }
-    """
 
-    initial_analysis_json = None
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = await model.generate_content_async(
-                [image_part, prompt_1_identify],
-                stream=False,
-                generation_config=generation_config
-            )
-            initial_analysis_json = json.loads(response.text)
-            break
-        except Exception as e:
-            print(
-                f"An error occurred during identification (attempt {attempt + 1}): {e}")
-            if attempt == MAX_RETRIES - 1:
-                raise HTTPException(
-                    status_code=503,
-                    detail=f"The model failed to identify the item after {MAX_RETRIES} attempts."
-                )
-
-    search_query = " ".join(initial_analysis_json.get("searchKeywords", []))
-    if not search_query:
+@app.post("/analyze-image/", response_model=ImageAnalysisResponse)
+async def analyze_image(image: UploadFile = File(...), mode: str | None = Query(None)):
+    if mode is not None and mode not in ANALYSIS_MODES:
         raise HTTPException(
-            status_code=400, detail="Could not generate search keywords from image.")
-
-    try:
-        ebay_listings = await search_items(search_query, limit=10)
-        print(f"Ebay listigs found: {ebay_listings}")
-    except Exception as e:
-        print(f"Error searching eBay: {e}")
+            status_code=400, detail=f"Invalid mode. Expected one of {', '.join(ANALYSIS_MODES)}.")
+    if not image.content_type.startswith("image/"):
         raise HTTPException(
-            status_code=500, detail=f"Failed to fetch listings from eBay: {e}")
+            status_code=400, detail="Invalid file type. Please upload an image.")
+    model = await get_model()
+    upload = await _ingest_image(image)
+    with upload:
+        return await analyze_image_bytes(
+            model, upload.source, image.content_type, mode or ANALYSIS_MODE, upload.digest, with_draft=True)
 
-    prompt_2_price = f"""
-    You are an expert e-commerce price analyst. Your task is to provide a price estimate for the item shown in the image,
-    based on its description and a list of comparable items found on eBay.
 
-    Analyze the provided item information, the image itself (paying attention to condition), and the market data.
-    Consider how the item's condition compares to the listings. Provide a realistic price range and a suggested price. Ignore irrelevant listings.
+def _ndjson_event(stage: str, data) -> bytes:
+    return (json.dumps({"stage": stage, "data": data}) + "\n").encode()
 
-    You MUST respond with ONLY a valid JSON object. Do not include any other text, explanations, or markdown formatting.
 
-    **Item to be Priced:**
-    ```json
-    {json.dumps(initial_analysis_json, indent=2)}
-    ```
+@app.post("/analyze-image/stream")
+async def analyze_image_stream(image: UploadFile = File(...), mode: str | None = Query(None)):
+    """
+    Same analysis as /analyze-image/, streamed as NDJSON: one line per stage
+    (identify, comparables, price) as soon as it completes, then the merged result
+    with its draftId.
+    """
+    if mode is not None and mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid mode. Expected one of {', '.join(ANALYSIS_MODES)}.")
+    if not image.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=400, detail="Invalid file type. Please upload an image.")
+    model = await get_model()
+    upload = await _ingest_image(image)
+    with upload:
+        analysis_input = await prepare_analysis(
+            upload.source, image.content_type, upload.digest, with_listing_image=True)
+
+    async def events():
+        if analysis_input.cached_response is not None:
+            yield _ndjson_event("result", await save_draft(analysis_input, analysis_input.cached_response))
+            return
+        try:
+            async for stage, data in stream_analysis(model, analysis_input.image_part, mode or ANALYSIS_MODE):
+                if stage == "result":
+                    await remember_analysis(analysis_input, data)
+                    data = await save_draft(analysis_input, data)
+                yield _ndjson_event(stage, data)
+        except HTTPException as e:
+            yield _ndjson_event("error", {"status": e.status_code, "detail": e.detail})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/analyze-image/batch")
+async def analyze_image_batch(
+    images: List[UploadFile] = File(None),
+    archive: UploadFile | None = File(None),
+    mode: str | None = Query(None)
+):
+    """
+    Analyzes many photos at once, given as repeated `images` parts and/or a zip
+    `archive`. Streams one NDJSON line per photo, in completion order.
+    """
+    if mode is not None and mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid mode. Expected one of {', '.join(ANALYSIS_MODES)}.")
 
-    **Comparable eBay Listings (Market   Data):**
-    ```json
-    {json.dumps(ebay_listings, indent=2)}
-    ```
+    for image in images or []:
+        if not image.content_type.startswith("image/"):
+            raise HTTPException(
+                status_code=400, detail=f"Invalid file type for {image.filename}. Please upload images.")
+    if len(images or []) > BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=413, detail=f"Too many images. A batch can contain at most {BATCH_MAX_IMAGES}.")
+    model = await get_model()
 
-    **Required Output JSON Schema:**
-    {{
-      "estimatedPrice": {{
-        "min": 0.0,
-        "max": 0.0,
-        "suggested": 0.0
-      }}
-    }}
-    """
+    # (filename, content_type, bytes or spooled file path or ZipMember, digest or None)
+    uploads = []
+    spooled = []
+    try:
+        for image in images or []:
+            upload = await ingest_upload(image)
+            spooled.append(upload)
+            uploads.append((image.filename, image.content_type, upload.source, upload.digest))
+        if archive is not None:
+            # Kept until the batch finishes; each member is decompressed when its turn comes
+            upload = await ingest_upload(archive, max_bytes=UPLOAD_MAX_REQUEST_BYTES)
+            spooled.append(upload)
+            try:
+                members = await run_in_threadpool(list_zip_images, upload.source)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Could not read zip archive: {e}")
+            uploads.extend((name, content_type, member, None) for name, content_type, member in members)
+    except BaseException:
+        for upload in spooled:
+            upload.close()
+        raise
+
+    if not uploads:
+        for upload in spooled:
+            upload.close()
+        raise HTTPException(status_code=400, detail="No images were uploaded.")
+    if len(uploads) > BATCH_MAX_IMAGES:
+        for upload in spooled:
+            upload.close()
+        raise HTTPException(
+            status_code=413, detail=f"Too many images. A batch can contain at most {BATCH_MAX_IMAGES}.")
 
-    price_analysis_json = None
-    for attempt in range(MAX_RETRIES):
+    # Items wait here rather than in the model governor, whose deadline would
+    # expire for most of a large batch before their turn came
+    batch_slots = asyncio.Semaphore(MODEL_CONCURRENCY)
+
+    async def analyze_one(index, filename, content_type, image_data, digest):
         try:
-            response = await model.generate_content_async(
-                [image_part, prompt_2_price],
-                stream=False,
-                generation_config=generation_config
-            )
-            price_analysis_json = json.loads(response.text)
-            break
+            async with batch_slots:
+                if isinstance(image_data, ZipMember):
+                    image_data = await asyncio.to_thread(image_data.read)
+                result = await analyze_image_bytes(model, image_data, content_type, mode or ANALYSIS_MODE, digest)
+            return {"index": index, "filename": filename, "result": result}
         except Exception as e:
-            print(f"An error occurred on attempt {attempt + 1}: {e}")
+            return {"index": index, "filename": filename,
+                    "error": {"status": getattr(e, "status_code", 500), "detail": str(getattr(e, "detail", e))}}
 
-    if not price_analysis_json or "estimatedPrice" not in price_analysis_json:
+    async def results():
+        tasks = [asyncio.create_task(analyze_one(i, *upload)) for i, upload in enumerate(uploads)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield (json.dumps(await next_result) + "\n").encode()
+        finally:
+            for task in tasks:
+                task.cancel()
+            for upload in spooled:
+                upload.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.post("/analyze-image/jobs", status_code=202)
+async def submit_analysis_job(
+    image: UploadFile = File(...),
+    mode: str | None = Form(None),
+    webhook_url: str | None = Form(None)
+):
+    """
+    Queues an analysis and returns its job id immediately. Poll
+    /analyze-image/jobs/{job_id}, or pass webhook_url to have the result POSTed.
+    """
+    if mode is not None and mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid mode. Expected one of {', '.join(ANALYSIS_MODES)}.")
+    if not image.content_type.startswith("image/"):
         raise HTTPException(
-            status_code=503,
-            detail=f"The model failed to generate a price estimate after {MAX_RETRIES} attempts."
-        )
+            status_code=400, detail="Invalid file type. Please upload an image.")
+    if webhook_url:
+        try:
+            await check_webhook_url(webhook_url)
+        except InvalidWebhook as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    with await ingest_upload(image) as upload:
+        image_data = await run_in_threadpool(upload.read_bytes)
+    try:
+        job_id = await job_queue.submit(image_data, image.content_type, mode, webhook_url)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return {"jobId": job_id, "status": "queued"}
+
+
+@app.get("/analyze-image/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
 
-    # Merge the initial analysis with the price analysis
-    final_response = initial_analysis_json
-    final_response.update(price_analysis_json) # This adds the 'estimatedPrice' key
 
-    return final_response
-    
 @app.get("/")
 async def read_root():
     return {"message": "Hello world!"}
 
+
+@app.get("/ready")
+async def read_ready():
+    """
+    Readiness, as opposed to liveness (`/`): 200 once startup has finished and,
+    with PROVIDER_WARMUP, the model is initialized; 503 until then.
+    """
+    ready = _started and (providers_ready() or not PROVIDER_WARMUP)
+    return JSONResponse(
+        {"ready": ready, "providers": provider_stats()}, status_code=200 if ready else 503)
+
+
+@app.get("/metrics")
+async def read_metrics():
+    return {
+        "analysisCache": analysis_cache.stats(),
+        "nearDuplicates": near_duplicate_index.stats(),
+        "comparablesCache": comparables_cache.stats(),
+        "jobs": await job_queue.stats(),
+        "modelGovernor": model_governor.stats(),
+        "ebaySearch": search_stats(),
+        "pictureCache": picture_cache.stats(),
+        "drafts": await draft_store.stats(),
+        "degraded": degraded_stats,
+        "providers": provider_stats(),
+    }
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # Workers are separate processes; share the token and caches between them
+        os.environ.setdefault("STATE_BACKEND", "sqlite")
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
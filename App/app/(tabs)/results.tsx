@@ -13,6 +13,7 @@ type AnalysisResult = {
   item: string;
   searchKeywords: string[];
   imageQuality: 'Excellent' | 'Good' | 'Fair' | 'Poor';
+  draftId?: string;
 };
 
 export default function ResultsScreen() {
@@ -118,24 +119,35 @@ export default function ResultsScreen() {
             try {
               setLoading(true);
           
-              const formData = new FormData();
-              formData.append("title", itemName);
-              formData.append("description", description);
-              formData.append("price", selectedPrice.toString());
-              formData.append("condition", condition);
-              formData.append("image", {
-                uri: params.imageUri,
-                name: "upload.jpg",
-                type: "image/jpeg",
-              } as any);
-          
-              const response = await fetch("http://10.253.20.128:8000/post/", {
-                method: "POST",
-                headers: {
-                  "Content-Type": "multipart/form-data",
-                },
-                body: formData,
-              });
+              const postListing = (draftId?: string) => {
+                const formData = new FormData();
+                formData.append("title", itemName);
+                formData.append("description", description);
+                formData.append("price", selectedPrice.toString());
+                formData.append("condition", condition);
+                if (draftId) {
+                  formData.append("draft_id", draftId);
+                } else {
+                  formData.append("image", {
+                    uri: params.imageUri,
+                    name: "upload.jpg",
+                    type: "image/jpeg",
+                  } as any);
+                }
+                return fetch("http://10.253.20.128:8000/post/", {
+                  method: "POST",
+                  headers: {
+                    "Content-Type": "multipart/form-data",
+                  },
+                  body: formData,
+                });
+              };
+
+              let response = await postListing(result.draftId);
+              // The draft expired on the server; send the photo instead
+              if (response.status === 404 && result.draftId) {
+                response = await postListing();
+              }
           
               if (!response.ok) {
                 const errorText = await response.text();